@@ -4,14 +4,16 @@ import os
 import nest_asyncio
 from flask import Flask
 
-from libs.generic import load_config, get_bool
+from libs.generic import ConfigSingleton, load_config, get_bool
 from routes import (
     auth_routes,
+    event_routes,
     favourites_routes,
     gallery_routes,
     image_routes,
     index_routes,
     job_routes,
+    prompt_routes,
     create_routes,
     settings_routes
 )
@@ -20,6 +22,7 @@ logging.basicConfig(level=logging.INFO, force=True)
 logger = logging.getLogger(__name__)
 
 user_config = load_config()
+ConfigSingleton.start_watcher()
 
 nest_asyncio.apply()
 
@@ -30,52 +33,72 @@ if not secret_key:
     secret_key = secrets.token_hex(32)
 app.secret_key = secret_key
 
-from libs.generic import get_current_version
+from libs.generic import get_build_info
+build_info = get_build_info()
+logger.info("AI Frame Image Server version %s", build_info["version"])
+
 @app.context_processor
 def inject_version():
-    version = get_current_version()
-    return dict(version=version)
+    return dict(version=build_info["version"])
 
 create_routes.init_app(user_config)
 auth_routes.init_app(user_config)
 
 app.register_blueprint(index_routes.bp)
 app.register_blueprint(auth_routes.bp)
+app.register_blueprint(event_routes.bp)
 app.register_blueprint(favourites_routes.bp)
 app.register_blueprint(gallery_routes.bp)
 app.register_blueprint(image_routes.bp)
 app.register_blueprint(job_routes.bp)
+app.register_blueprint(prompt_routes.bp)
 app.register_blueprint(create_routes.bp)
 app.register_blueprint(settings_routes.bp)
 
 from apscheduler.schedulers.background import BackgroundScheduler
 import time
-from libs.comfyui import create_image
+from libs import comfy_pool, jobs, model_catalog, prompt_buffer, ready_pool
+
+model_catalog.start(user_config)
+comfy_pool.start(user_config)
+jobs.start(user_config)
+prompt_buffer.start(user_config)
+ready_pool.start(user_config)
 
 def scheduled_task():
     logger.info("Executing scheduled task at %s", time.strftime('%Y-%m-%d %H:%M:%S'))
-    from libs.generic import create_prompt_with_random_model
-    base_prompt = user_config["comfyui"].get("prompt", "Generate a random detailed prompt for stable diffusion.")
-    prompt, topic = create_prompt_with_random_model(base_prompt, "")
-    if prompt:
-        model = "Random Image Model"
-        create_image(prompt, model, topic)
-    else:
-        logger.warning("Failed to generate a prompt for the scheduled task.")
+    if ready_pool.advance():
+        return
+    batch_size = user_config.getint("comfyui", "batch_size", fallback=1)
+    job_id = jobs.submit_job(model="Random Image Model", count=batch_size)
+    logger.info("Scheduled generation queued as job %s", job_id)
 
+scheduler = BackgroundScheduler()
 should_schedule = get_bool(user_config, "frame", "auto_regen", False)
 logger.info("auto_regen config check: %s", should_schedule)
 if should_schedule:
     logger.info("Initializing scheduled image generation at %s", user_config["frame"]["regen_time"])
-    scheduler = BackgroundScheduler()
     h, m = user_config["frame"]["regen_time"].split(":")
     scheduler.add_job(scheduled_task, "cron", hour=h, minute=m, id="scheduled_task", max_instances=1, replace_existing=True)
-    scheduler.start()
     logger.info("Scheduled image generation active - will run daily at %s", user_config["frame"]["regen_time"])
 
+rotate_interval = user_config.getint("frame", "rotate_interval", fallback=0)
+if rotate_interval > 0:
+    scheduler.add_job(ready_pool.advance, "interval", minutes=rotate_interval, id="rotate_frame", max_instances=1, replace_existing=True)
+    logger.info("Rotating the frame through the ready pool every %d minute(s)", rotate_interval)
+
+if scheduler.get_jobs():
+    scheduler.start()
+
 output_dir = user_config["comfyui"]["output_dir"].rstrip("/")
 os.makedirs(output_dir, exist_ok=True)
 
+import threading
+from libs.catalog import reconcile
+threading.Thread(target=reconcile, kwargs={"output_dir": output_dir, "full": True}, name="catalog-reconcile", daemon=True).start()
+from libs import prompt_history
+threading.Thread(target=prompt_history.start, name="prompt-history", daemon=True).start()
+
 debug = os.environ.get("FLASK_DEBUG", "false").lower() == "true"
 if debug:
     logger.info("Running in debug mode with Flask dev server")
@@ -83,8 +106,10 @@ if debug:
 else:
     try:
         from waitress import serve
-        logger.info("Starting production server on port %s", user_config["frame"]["port"])
-        serve(app, host="0.0.0.0", port=user_config["frame"]["port"])
+        # Every frame holds one worker thread open for its event stream.
+        threads = user_config.getint("frame", "server_threads", fallback=16)
+        logger.info("Starting production server on port %s with %d threads", user_config["frame"]["port"], threads)
+        serve(app, host="0.0.0.0", port=user_config["frame"]["port"], threads=threads)
     except ImportError:
         logger.warning("waitress not installed, falling back to Flask dev server")
         app.run(host="0.0.0.0", port=user_config["frame"]["port"], debug=False)
\ No newline at end of file
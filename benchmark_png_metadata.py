@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import statistics
+import time
+
+from PIL import Image
+
+from libs.generic import parse_workflow_details
+from libs.png_chunks import read_png_header
+
+
+def details_with_pillow(path: str) -> tuple[tuple[int, int], str, str]:
+    with Image.open(path) as img:
+        size = img.size
+        workflow = img.info.get("prompt")
+    prompt, model = parse_workflow_details(json.loads(workflow)) if workflow else ("", "")
+    return size, prompt, model
+
+
+def details_with_chunks(path: str) -> tuple[tuple[int, int], str, str]:
+    size, texts = read_png_header(path, {"prompt"})
+    workflow = texts.get("prompt")
+    prompt, model = parse_workflow_details(json.loads(workflow)) if workflow else ("", "")
+    return size, prompt, model
+
+
+def time_reader(reader, paths: list[str], rounds: int) -> list[float]:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for path in paths:
+            reader(path)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Pillow and the chunk-only PNG reader for metadata extraction.")
+    parser.add_argument("directory", nargs="?", default="output", help="Directory of ComfyUI PNG outputs (default: output)")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed passes over the directory (default: 5)")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N images (default: all)")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.directory, name)
+        for name in os.listdir(args.directory)
+        if name.lower().endswith(".png")
+    )
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        print(f"No PNG files found in {args.directory}")
+        return
+
+    mismatches = [p for p in paths if details_with_pillow(p) != details_with_chunks(p)]
+    for path in mismatches:
+        print(f"⚠️ Readers disagree on {path}")
+
+    # One untimed pass so both readers see the same warm page cache.
+    time_reader(details_with_pillow, paths, 1)
+
+    results = {
+        "pillow": time_reader(details_with_pillow, paths, args.rounds),
+        "chunks": time_reader(details_with_chunks, paths, args.rounds),
+    }
+
+    print(f"{len(paths)} images, {args.rounds} rounds, {len(mismatches)} mismatches")
+    for name, timings in results.items():
+        best = min(timings)
+        print(
+            f"{name:>7}: best {best * 1000:8.1f} ms, median {statistics.median(timings) * 1000:8.1f} ms, "
+            f"{best / len(paths) * 1e6:8.1f} µs/image, {len(paths) / best:8.0f} images/s"
+        )
+    print(f"speedup: {min(results['pillow']) / min(results['chunks']):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,88 @@
+import argparse
+import logging
 import os
-from PIL import Image
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-# Define paths
-input_folder = "output"
-thumbs_folder = "output/thumbnails"
-thumb_width = 500
-
-# Create the thumbs folder if it doesn't exist
-os.makedirs(thumbs_folder, exist_ok=True)
+from libs.create_thumbnail import generate_thumbnail, get_thumbnail_settings, is_thumbnail_current
 
 # Supported image extensions
 image_extensions = (".png", ".jpg", ".jpeg", ".webp")
 
-# Loop through files
-for filename in os.listdir(input_folder):
-    if filename.lower().endswith(image_extensions):
-        input_path = os.path.join(input_folder, filename)
-        output_path = os.path.join(thumbs_folder, filename)
+PROGRESS_INTERVAL = 2.0
+
+
+def _build_thumbnail(image_path: str, force: bool, settings: tuple) -> tuple[str, bool]:
+    tiers, fmt, quality = settings
+    thumbnail_path = generate_thumbnail(image_path, force=force, tiers=tiers, fmt=fmt, quality=quality)
+    return image_path, is_thumbnail_current(image_path, thumbnail_path, tiers, fmt)
+
+
+def find_pending(input_folder: str, force: bool, settings: tuple) -> tuple[list[str], int]:
+    tiers, fmt, _ = settings
+    pending = []
+    up_to_date = 0
+    for entry in os.scandir(input_folder):
+        if not entry.is_file() or not entry.name.lower().endswith(image_extensions):
+            continue
+        if not force and is_thumbnail_current(entry.path, tiers=tiers, fmt=fmt):
+            up_to_date += 1
+            continue
+        pending.append(entry.path)
+    return pending, up_to_date
+
+
+def _report(done: int, failed: int, total: int, started: float) -> None:
+    elapsed = time.monotonic() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else 0.0
+    print(f"⏳ {done}/{total} thumbnails ({failed} failed) - {rate:.1f} images/s - ETA {eta:.0f}s", flush=True)
 
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Backfill gallery thumbnails in parallel. Safe to interrupt and re-run: "
+                    "thumbnails newer than their source image are skipped."
+    )
+    parser.add_argument("--input", default="output", help="Folder of generated images (default: output)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: number of cores)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every thumbnail, even up-to-date ones")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    settings = get_thumbnail_settings()
+    pending, up_to_date = find_pending(args.input, args.force, settings)
+    total = len(pending)
+    print(f"🔍 {total} thumbnails to build, {up_to_date} already up to date", flush=True)
+    if not pending:
+        return 0
+
+    done = failed = 0
+    started = last_report = time.monotonic()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = [executor.submit(_build_thumbnail, path, args.force, settings) for path in pending]
         try:
-            with Image.open(input_path) as img:
-                # Maintain aspect ratio
-                img.thumbnail((thumb_width, img.height), Image.LANCZOS)
-                img.save(output_path)
-                print(f"✅ Thumbnail saved: {output_path}")
-        except Exception as e:
-            print(f"❌ Error processing {filename}: {e}")
+            for future in as_completed(futures):
+                image_path, ok = future.result()
+                done += 1
+                if not ok:
+                    failed += 1
+                    print(f"❌ Error processing {os.path.basename(image_path)}", flush=True)
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    _report(done, failed, total, started)
+                    last_report = time.monotonic()
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            print(f"\n⏹️ Interrupted after {done}/{total} thumbnails; re-run to resume.", flush=True)
+            return 130
+
+    _report(done, failed, total, started)
+    print(f"✅ Finished in {time.monotonic() - started:.1f}s", flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
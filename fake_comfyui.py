@@ -0,0 +1,309 @@
+"""A small stand-in for a ComfyUI server, for developing against the backend pool
+without a GPU.
+
+It implements the parts of the ComfyUI API this app uses: /object_info[/<node>], /prompt,
+/queue, /history/<id>, /view, /interrupt and the /ws progress websocket. Prompts
+are "rendered" one at a time by sleeping through a number of sampler steps and
+returning a solid-colour PNG that carries the workflow in its metadata.
+
+Run a few on different ports and list them all in `comfyui_url`:
+
+    python fake_comfyui.py --port 8188 --models a.safetensors,b.safetensors
+    python fake_comfyui.py --port 8189 --models b.safetensors --fail-rate 0.2
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import random
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MODEL_INPUTS = ("ckpt_name", "unet_name")
+
+
+class FakeComfyUI:
+    def __init__(self, models, steps, step_delay, fail_rate):
+        self.models = list(models)
+        self.steps = steps
+        self.step_delay = step_delay
+        self.fail_rate = fail_rate
+        self.condition = threading.Condition()
+        self.pending = deque()
+        self.running = None
+        self.interrupted = False
+        self.history = {}
+        self.images = {}
+        self.clients = {}
+        self.counter = 0
+
+    # Websocket clients
+
+    def send(self, client_id, msg_type, data):
+        targets = [self.clients.get(client_id)] if client_id in self.clients else list(self.clients.values())
+        for client in targets:
+            if client is not None:
+                client.send_json({"type": msg_type, "data": data})
+
+    def broadcast_status(self):
+        with self.condition:
+            remaining = len(self.pending) + (1 if self.running else 0)
+        for client in list(self.clients.values()):
+            client.send_json({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": remaining}}}})
+
+    # Queue
+
+    def queue(self, prompt, client_id):
+        for node in prompt.values():
+            for key in MODEL_INPUTS:
+                model = node.get("inputs", {}).get(key)
+                if model is not None and model not in self.models:
+                    return None, f"Value not in list: {key}: '{model}'"
+        with self.condition:
+            self.counter += 1
+            item = {"number": self.counter, "prompt_id": str(uuid.uuid4()), "prompt": prompt, "client_id": client_id}
+            self.pending.append(item)
+            self.condition.notify_all()
+        self.broadcast_status()
+        return item, None
+
+    def queue_snapshot(self):
+        with self.condition:
+            def entry(item):
+                return [item["number"], item["prompt_id"], item["prompt"], {"client_id": item["client_id"]}, []]
+            return {
+                "queue_running": [entry(self.running)] if self.running else [],
+                "queue_pending": [entry(item) for item in self.pending],
+            }
+
+    def interrupt(self):
+        with self.condition:
+            self.interrupted = self.running is not None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                item = self.running = self.pending.popleft()
+                self.interrupted = False
+            self.broadcast_status()
+            self.execute(item)
+            with self.condition:
+                self.running = None
+            self.broadcast_status()
+
+    def execute(self, item):
+        prompt_id, client_id, prompt = item["prompt_id"], item["client_id"], item["prompt"]
+        save_nodes = [nid for nid, node in prompt.items() if node.get("class_type") == "SaveImage"]
+        sampler = next((nid for nid, node in prompt.items() if "Sampler" in node.get("class_type", "")), None)
+
+        self.send(client_id, "execution_start", {"prompt_id": prompt_id})
+        self.send(client_id, "executing", {"node": sampler, "prompt_id": prompt_id})
+        for step in range(1, self.steps + 1):
+            time.sleep(self.step_delay)
+            if self.interrupted:
+                self.send(client_id, "execution_interrupted", {"prompt_id": prompt_id, "node_id": sampler})
+                self.history[prompt_id] = {"outputs": {}, "status": {"status_str": "error", "completed": False}}
+                return
+            self.send(client_id, "progress", {"value": step, "max": self.steps, "prompt_id": prompt_id, "node": sampler})
+
+        if random.random() < self.fail_rate:
+            self.send(client_id, "execution_error", {"prompt_id": prompt_id, "node_id": sampler,
+                                                     "exception_message": "Simulated failure"})
+            self.history[prompt_id] = {"outputs": {}, "status": {"status_str": "error", "completed": False}}
+            return
+
+        outputs = {}
+        for node_id in save_nodes:
+            prefix = prompt[node_id].get("inputs", {}).get("filename_prefix", "ComfyUI")
+            filename = f"{prefix}_{prompt_id[:8]}_{node_id}.png"
+            self.images[filename] = self.render_png(prompt)
+            outputs[node_id] = {"images": [{"filename": filename, "subfolder": "", "type": "output"}]}
+            self.send(client_id, "executing", {"node": node_id, "prompt_id": prompt_id})
+            self.send(client_id, "executed", {"node": node_id, "output": outputs[node_id], "prompt_id": prompt_id})
+
+        self.history[prompt_id] = {"prompt": [item["number"], prompt_id, prompt, {}, list(outputs)],
+                                   "outputs": outputs, "status": {"status_str": "success", "completed": True}}
+        self.send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+        self.send(client_id, "execution_success", {"prompt_id": prompt_id, "timestamp": int(time.time() * 1000)})
+
+    @staticmethod
+    def render_png(prompt):
+        colour = tuple(random.randrange(256) for _ in range(3))
+        info = PngInfo()
+        info.add_text("prompt", json.dumps(prompt))
+        buffer = io.BytesIO()
+        Image.new("RGB", (256, 144), colour).save(buffer, format="PNG", pnginfo=info)
+        return buffer.getvalue()
+
+
+class WebSocketClient:
+    def __init__(self, handler):
+        self.handler = handler
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send_json(self, payload):
+        data = json.dumps(payload).encode("utf-8")
+        if len(data) < 126:
+            header = struct.pack("!BB", 0x81, len(data))
+        elif len(data) < 65536:
+            header = struct.pack("!BBH", 0x81, 126, len(data))
+        else:
+            header = struct.pack("!BBQ", 0x81, 127, len(data))
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                self.handler.wfile.write(header + data)
+                self.handler.wfile.flush()
+            except OSError:
+                self.closed = True
+
+    def read_until_closed(self):
+        rfile = self.handler.rfile
+        while True:
+            head = rfile.read(2)
+            if len(head) < 2:
+                break
+            opcode, length = head[0] & 0x0F, head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", rfile.read(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", rfile.read(8))[0]
+            if head[1] & 0x80:
+                rfile.read(4)  # masking key; payloads are ignored
+            rfile.read(length)
+            if opcode == 0x8:
+                break
+            if opcode == 0x9:
+                with self.lock:
+                    self.handler.wfile.write(b"\x8a\x00")
+                    self.handler.wfile.flush()
+        with self.lock:
+            self.closed = True
+
+
+def make_handler(server: FakeComfyUI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def send_json(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/ws":
+                return self.websocket(parse_qs(url.query).get("clientId", [""])[0])
+            if url.path == "/object_info" or url.path.startswith("/object_info/"):
+                nodes = {
+                    "CheckpointLoaderSimple": {"input": {"required": {"ckpt_name": [server.models]}}},
+                    "UnetLoaderGGUF": {"input": {"required": {"unet_name": [server.models]}}},
+                }
+                node = url.path[len("/object_info/"):]
+                if node:
+                    nodes = {node: nodes[node]} if node in nodes else {}
+                return self.send_json(nodes)
+            if url.path == "/queue":
+                return self.send_json(server.queue_snapshot())
+            if url.path.startswith("/history/"):
+                prompt_id = url.path.rsplit("/", 1)[-1]
+                entry = server.history.get(prompt_id)
+                return self.send_json({prompt_id: entry} if entry else {})
+            if url.path == "/view":
+                image = server.images.get(parse_qs(url.query).get("filename", [""])[0])
+                if image is None:
+                    return self.send_json({"error": "not found"}, 404)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(image)))
+                self.end_headers()
+                self.wfile.write(image)
+                return
+            self.send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if self.path == "/prompt":
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    return self.send_json({"error": "invalid json"}, 400)
+                item, error = server.queue(payload.get("prompt", {}), payload.get("client_id"))
+                if error:
+                    return self.send_json({"error": {"type": "prompt_outputs_failed_validation", "message": error}}, 400)
+                return self.send_json({"prompt_id": item["prompt_id"], "number": item["number"], "node_errors": {}})
+            if self.path == "/interrupt":
+                server.interrupt()
+                return self.send_json({})
+            self.send_json({"error": "not found"}, 404)
+
+        def websocket(self, client_id):
+            key = self.headers.get("Sec-WebSocket-Key", "")
+            accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+            self.send_response(101)
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.wfile.flush()
+
+            client_id = client_id or uuid.uuid4().hex
+            client = WebSocketClient(self)
+            server.clients[client_id] = client
+            client.send_json({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": len(server.pending)}},
+                                                         "sid": client_id}})
+            try:
+                client.read_until_closed()
+            finally:
+                if server.clients.get(client_id) is client:
+                    del server.clients[client_id]
+                self.close_connection = True
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake ComfyUI server for local development.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--models", default="sd_xl_base_1.0.safetensors",
+                        help="Comma-separated models this backend reports as loadable")
+    parser.add_argument("--steps", type=int, default=10, help="Sampler steps per render (default: 10)")
+    parser.add_argument("--step-delay", type=float, default=0.2, help="Seconds per step (default: 0.2)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of renders that fail (default: 0)")
+    args = parser.parse_args()
+
+    fake = FakeComfyUI([m.strip() for m in args.models.split(",") if m.strip()], args.steps, args.step_delay, args.fail_rate)
+    threading.Thread(target=fake.run, daemon=True).start()
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(fake))
+    httpd.daemon_threads = True
+    print(f"Fake ComfyUI on http://{args.host}:{args.port} with models: {', '.join(fake.models)}", flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
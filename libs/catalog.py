@@ -0,0 +1,373 @@
+import base64
+import json
+import logging
+import os
+import sqlite3
+import stat
+import threading
+from datetime import datetime
+
+from PIL import Image
+
+from libs.generic import load_config, get_favourites, parse_workflow_details
+from libs.png_chunks import read_png_header
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILENAME = "catalog.db"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    filename TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER NOT NULL DEFAULT 0,
+    height INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL DEFAULT 0,
+    favourite INTEGER NOT NULL DEFAULT 0,
+    prompt TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS images_mtime ON images (mtime DESC, filename DESC);
+"""
+
+_MIGRATIONS = {
+    "created": "ALTER TABLE images ADD COLUMN created REAL NOT NULL DEFAULT 0",
+}
+
+_UPSERT_SQL = (
+    "INSERT INTO images (filename, mtime, size, width, height, created, favourite, prompt, model) "
+    "VALUES (:filename, :mtime, :size, :width, :height, :created, :favourite, :prompt, :model) "
+    "ON CONFLICT(filename) DO UPDATE SET mtime = excluded.mtime, size = excluded.size, "
+    "width = excluded.width, height = excluded.height, created = excluded.created, "
+    "prompt = excluded.prompt, model = excluded.model"
+)
+
+_RECONCILE_BATCH = 500
+_EMPTY_DETAILS = {"p": "", "m": "", "d": ""}
+
+_connections: dict[str, sqlite3.Connection] = {}
+_db_lock = threading.Lock()
+_reconcile_lock = threading.Lock()
+_dir_mtimes: dict[str, int] = {}
+
+
+def _resolve_dir(output_dir: str | None) -> str:
+    if output_dir is None:
+        output_dir = load_config()["comfyui"]["output_dir"]
+    return os.path.abspath(output_dir)
+
+
+def _get_connection(output_dir: str) -> sqlite3.Connection:
+    conn = _connections.get(output_dir)
+    if conn is None:
+        os.makedirs(output_dir, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(output_dir, CATALOG_FILENAME), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(images)")}
+        for column, statement in _MIGRATIONS.items():
+            if column not in columns:
+                conn.execute(statement)
+        conn.commit()
+        _connections[output_dir] = conn
+    return conn
+
+
+def is_image_filename(filename: str) -> bool:
+    # Dotfiles are in-progress downloads and temp files, never gallery images.
+    return not filename.startswith(".") and filename.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _read_entry(path: str, st: os.stat_result | None = None) -> dict | None:
+    try:
+        st = st or os.stat(path)
+    except OSError:
+        return None
+
+    entry = {
+        "filename": os.path.basename(path),
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+        "width": 0,
+        "height": 0,
+        "created": st.st_ctime,
+        "prompt": "",
+        "model": "",
+    }
+    try:
+        if path.lower().endswith(".png"):
+            (entry["width"], entry["height"]), texts = read_png_header(path, {"prompt"})
+            workflow = texts.get("prompt")
+        else:
+            with Image.open(path) as img:
+                entry["width"], entry["height"] = img.size
+                workflow = img.info.get("prompt")
+        if workflow:
+            entry["prompt"], entry["model"] = parse_workflow_details(json.loads(workflow))
+    except Exception as e:
+        logger.warning("Error indexing %s: %s", path, e)
+    return entry
+
+
+def _write_entries(conn: sqlite3.Connection, entries: list[dict], favourites: set[str]) -> None:
+    # The favourite flag only applies to new rows; existing rows keep theirs.
+    conn.executemany(_UPSERT_SQL, [dict(e, favourite=int(e["filename"] in favourites)) for e in entries])
+
+
+def _details_from_row(row) -> dict:
+    date = datetime.fromtimestamp(row["created"]).strftime("%d-%m-%Y") if row["created"] else ""
+    return {"p": row["prompt"], "m": row["model"], "d": date}
+
+
+def upsert_image(path: str, favourite: bool | None = None) -> None:
+    output_dir = _resolve_dir(os.path.dirname(path))
+    entry = _read_entry(path)
+    if entry is None:
+        return
+    favourites = set(get_favourites()) if favourite is None else ({entry["filename"]} if favourite else set())
+    with _db_lock:
+        conn = _get_connection(output_dir)
+        _write_entries(conn, [entry], favourites)
+        if favourite is not None:
+            conn.execute("UPDATE images SET favourite = ? WHERE filename = ?", (int(favourite), entry["filename"]))
+        conn.commit()
+
+
+def get_details_many(filenames: list[str], output_dir: str | None = None) -> dict[str, dict | None]:
+    """Returns prompt/model/date details for each filename in the output directory.
+
+    Details are served from the catalog while the file's (mtime, size) still
+    match the stored row; anything missing or stale is parsed from the PNG
+    and written back, so each image is only decoded once across restarts.
+    Filenames that are not image files on disk map to None and are never
+    added to the catalog.
+    """
+    output_dir = _resolve_dir(output_dir)
+    results: dict[str, dict | None] = {}
+    stats: dict[str, os.stat_result] = {}
+    for filename in filenames:
+        st = None
+        if is_image_filename(filename):
+            try:
+                st = os.stat(os.path.join(output_dir, filename))
+            except OSError:
+                pass
+        if st is not None and stat.S_ISREG(st.st_mode):
+            stats[filename] = st
+        else:
+            results[filename] = None
+
+    if stats:
+        placeholders = ",".join("?" * len(stats))
+        with _db_lock:
+            conn = _get_connection(output_dir)
+            rows = conn.execute(
+                f"SELECT filename, mtime, size, created, prompt, model FROM images WHERE filename IN ({placeholders})",
+                list(stats),
+            ).fetchall()
+        for row in rows:
+            st = stats[row["filename"]]
+            if (row["mtime"], row["size"]) == (st.st_mtime, st.st_size):
+                results[row["filename"]] = _details_from_row(row)
+
+    missing = [f for f in stats if f not in results]
+    if missing:
+        entries = [e for e in (_read_entry(os.path.join(output_dir, f), stats[f]) for f in missing) if e is not None]
+        favourites = set(get_favourites())
+        with _db_lock:
+            conn = _get_connection(output_dir)
+            _write_entries(conn, entries, favourites)
+            conn.commit()
+        for entry in entries:
+            results[entry["filename"]] = _details_from_row(entry)
+
+    return results
+
+
+def get_details(path: str) -> dict:
+    filename = os.path.basename(path)
+    details = get_details_many([filename], os.path.dirname(path)).get(filename)
+    return details if details is not None else dict(_EMPTY_DETAILS)
+
+
+def remove_image(filename: str, output_dir: str | None = None) -> None:
+    output_dir = _resolve_dir(output_dir)
+    with _db_lock:
+        conn = _get_connection(output_dir)
+        conn.execute("DELETE FROM images WHERE filename = ?", (filename,))
+        conn.commit()
+
+
+def rename_entry(old_filename: str, new_filename: str, output_dir: str | None = None) -> None:
+    output_dir = _resolve_dir(output_dir)
+    with _db_lock:
+        conn = _get_connection(output_dir)
+        conn.execute("DELETE FROM images WHERE filename = ?", (new_filename,))
+        updated = conn.execute(
+            "UPDATE images SET filename = ? WHERE filename = ?", (new_filename, old_filename)
+        ).rowcount
+        conn.commit()
+    if not updated:
+        upsert_image(os.path.join(output_dir, new_filename))
+
+
+def set_favourite(filename: str, favourited: bool, output_dir: str | None = None) -> None:
+    set_favourites({filename: favourited}, output_dir)
+
+
+def set_favourites(states: dict[str, bool], output_dir: str | None = None) -> None:
+    """Updates the favourite flag of several images in one transaction."""
+    output_dir = _resolve_dir(output_dir)
+    with _db_lock:
+        conn = _get_connection(output_dir)
+        conn.executemany("UPDATE images SET favourite = ? WHERE filename = ?",
+                         [(int(favourited), filename) for filename, favourited in states.items()])
+        conn.commit()
+
+
+def _sync_favourites(conn: sqlite3.Connection, favourites: set[str]) -> None:
+    indexed = {row["filename"] for row in conn.execute("SELECT filename FROM images WHERE favourite = 1")}
+    conn.executemany("UPDATE images SET favourite = 0 WHERE filename = ?", [(f,) for f in indexed - favourites])
+    conn.executemany("UPDATE images SET favourite = 1 WHERE filename = ?", [(f,) for f in favourites - indexed])
+
+
+def reconcile(output_dir: str | None = None, full: bool = False) -> tuple[int, int]:
+    """Brings the catalog in line with the files on disk.
+
+    A quick pass only indexes new files and drops missing ones; a full pass
+    also re-reads any file whose mtime or size changed and re-syncs the
+    favourite flags from favourites.json.
+
+    Returns:
+        A tuple of (indexed, removed) counts.
+    """
+    output_dir = _resolve_dir(output_dir)
+    with _reconcile_lock:
+        try:
+            _dir_mtimes[output_dir] = os.stat(output_dir).st_mtime_ns
+            scanned = {e.name: e for e in os.scandir(output_dir) if e.is_file() and is_image_filename(e.name)}
+        except FileNotFoundError:
+            scanned = {}
+
+        with _db_lock:
+            conn = _get_connection(output_dir)
+            known = {row["filename"]: (row["mtime"], row["size"]) for row in conn.execute("SELECT filename, mtime, size FROM images")}
+
+        removed = [name for name in known if name not in scanned]
+        pending = []
+        for name, dir_entry in scanned.items():
+            if name not in known:
+                pending.append(dir_entry)
+            elif full:
+                try:
+                    st = dir_entry.stat()
+                except OSError:
+                    continue
+                if (st.st_mtime, st.st_size) != known[name]:
+                    pending.append(dir_entry)
+
+        favourites = set(get_favourites())
+        with _db_lock:
+            conn.executemany("DELETE FROM images WHERE filename = ?", [(name,) for name in removed])
+            if full:
+                _sync_favourites(conn, favourites)
+            conn.commit()
+
+        indexed = 0
+        for start in range(0, len(pending), _RECONCILE_BATCH):
+            entries = []
+            for dir_entry in pending[start:start + _RECONCILE_BATCH]:
+                entry = _read_entry(dir_entry.path)
+                if entry is not None:
+                    entries.append(entry)
+            with _db_lock:
+                _write_entries(conn, entries, favourites)
+                conn.commit()
+            indexed += len(entries)
+
+        if indexed or removed:
+            logger.info("Catalog reconciled for %s: %d indexed, %d removed", output_dir, indexed, len(removed))
+        return indexed, len(removed)
+
+
+def ensure_current(output_dir: str | None = None) -> None:
+    output_dir = _resolve_dir(output_dir)
+    try:
+        dir_mtime = os.stat(output_dir).st_mtime_ns
+    except FileNotFoundError:
+        return
+    if _dir_mtimes.get(output_dir) == dir_mtime:
+        return
+    if _reconcile_lock.locked():
+        # Another reconcile is already filling the index; serve what it has so far.
+        return
+    reconcile(output_dir)
+
+
+def encode_cursor(image: dict) -> str:
+    raw = json.dumps([image["mtime"], image["filename"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[float, str] | None:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        mtime, filename = json.loads(raw)
+        return float(mtime), str(filename)
+    except (ValueError, TypeError):
+        return None
+
+
+def list_images(
+    output_dir: str | None = None,
+    limit: int | None = None,
+    after: tuple[float, str] | None = None,
+    favourites_only: bool = False,
+) -> list[dict]:
+    output_dir = _resolve_dir(output_dir)
+    clauses = []
+    params: list = []
+    if favourites_only:
+        clauses.append("favourite = 1")
+    if after is not None:
+        clauses.append("(mtime < ? OR (mtime = ? AND filename < ?))")
+        params.extend([after[0], after[0], after[1]])
+    query = "SELECT filename, mtime, size, width, height, favourite, prompt, model FROM images"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY mtime DESC, filename DESC LIMIT ?"
+    params.append(-1 if limit is None else limit)
+    with _db_lock:
+        conn = _get_connection(output_dir)
+        rows = conn.execute(query, params).fetchall()
+    return [
+        {
+            "filename": row["filename"],
+            "favourited": bool(row["favourite"]),
+            "mtime": row["mtime"],
+            "size": row["size"],
+            "width": row["width"],
+            "height": row["height"],
+            "prompt": row["prompt"],
+            "model": row["model"],
+        }
+        for row in rows
+    ]
+
+
+def page_images(
+    output_dir: str | None = None,
+    cursor: str | None = None,
+    limit: int = 24,
+    favourites_only: bool = False,
+) -> tuple[list[dict], str | None]:
+    after = decode_cursor(cursor) if cursor else None
+    images = list_images(output_dir, limit=limit + 1, after=after, favourites_only=favourites_only)
+    if len(images) <= limit:
+        return images, None
+    images = images[:limit]
+    return images, encode_cursor(images[-1])
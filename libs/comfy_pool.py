@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+
+import requests
+
+from libs.generic import get_config_snapshot
+from libs import comfy_progress, model_catalog
+
+logger = logging.getLogger(__name__)
+
+QUEUE_TTL = 5
+FAILURE_BACKOFF = 10.0
+MAX_FAILURE_BACKOFF = 300.0
+
+# Loader nodes whose choices tell us which models a backend can run.
+MODEL_LOADERS = {
+    "CheckpointLoaderSimple": "ckpt_name",
+    "UnetLoaderGGUF": "unet_name",
+    "UnetLoaderGGUFDisTorchMultiGPU": "unet_name",
+}
+
+_lock = threading.Lock()
+_backends: dict[str, dict] = {}
+
+
+def get_backend_urls(config=None) -> list[str]:
+    """Returns the configured ComfyUI URLs; `comfyui_url` may list several, comma-separated."""
+    if config is None:
+        return list(get_config_snapshot().comfyui_urls)
+    raw = config.get("comfyui", "comfyui_url", fallback="")
+    return [url.strip().rstrip("/") for url in raw.split(",") if url.strip()]
+
+
+def _backend(url: str) -> dict:
+    backend = _backends.get(url)
+    if backend is None:
+        backend = {"url": url, "queue": 0, "queue_time": 0.0,
+                   "in_flight": 0, "failures": 0, "down_until": 0.0}
+        _backends[url] = backend
+    return backend
+
+
+def get_models(url: str) -> set[str] | None:
+    """Returns the models a backend can load, from the shared model catalog.
+
+    None means the backend has never answered.
+    """
+    models = model_catalog.get(f"comfyui:{url}")
+    return set(models) if models is not None else None
+
+
+def _fetch_queue_depth(url: str) -> int | None:
+    try:
+        response = requests.get(url + "/queue", timeout=5)
+        response.raise_for_status()
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        logger.debug("Failed to fetch queue from %s: %s", url, e)
+        return None
+    return len(data.get("queue_pending", [])) + len(data.get("queue_running", []))
+
+
+def queue_depth(url: str) -> int:
+    """Prompts queued or running on a backend, from its websocket or a short-lived /queue cache."""
+    remaining, _ = comfy_progress.queue_state(url)
+    if remaining is not None:
+        return remaining
+
+    with _lock:
+        backend = _backend(url)
+        if time.time() - backend["queue_time"] < QUEUE_TTL:
+            return backend["queue"]
+
+    depth = _fetch_queue_depth(url)
+    with _lock:
+        if depth is not None:
+            backend.update(queue=depth, queue_time=time.time())
+        return backend["queue"]
+
+
+def acquire(model: str | None = None, exclude=(), prefer: str | None = None) -> str | None:
+    """Picks the least-loaded healthy backend that has ``model`` and reserves a slot on it.
+
+    Backends that recently failed are skipped until their backoff expires,
+    unless nothing else is left. ``prefer`` (the backend a job worker is
+    bound to) wins whenever it is still a candidate. Every successful
+    acquire must be paired with a release().
+
+    Returns:
+        The backend URL, or None if every backend is excluded.
+    """
+    urls = [url for url in get_backend_urls() if url not in exclude]
+    if not urls:
+        return None
+
+    now = time.time()
+    with _lock:
+        healthy = [url for url in urls if _backend(url)["down_until"] <= now]
+    candidates = healthy or urls
+
+    if model:
+        inventories = {url: get_models(url) for url in candidates}
+        with_model = [url for url in candidates if inventories[url] and model in inventories[url]]
+        unknown = [url for url in candidates if inventories[url] is None]
+        candidates = with_model or unknown or candidates
+
+    if prefer in candidates:
+        with _lock:
+            _backend(prefer)["in_flight"] += 1
+        return prefer
+
+    depths = {url: queue_depth(url) for url in candidates}
+    with _lock:
+        # Our own in-flight prompts show up in the queue once ComfyUI accepts
+        # them, so count whichever is larger rather than adding the two.
+        url = min(
+            candidates,
+            key=lambda u: (max(depths[u], _backend(u)["in_flight"]), _backend(u)["failures"]),
+        )
+        _backend(url)["in_flight"] += 1
+    return url
+
+
+def release(url: str, ok: bool = True) -> None:
+    """Returns a slot taken by acquire(); failures put the backend into exponential backoff."""
+    with _lock:
+        backend = _backend(url)
+        backend["in_flight"] = max(0, backend["in_flight"] - 1)
+        if ok:
+            backend.update(failures=0, down_until=0.0)
+            return
+        backend["failures"] += 1
+        backoff = min(FAILURE_BACKOFF * 2 ** (backend["failures"] - 1), MAX_FAILURE_BACKOFF)
+        backend["down_until"] = time.time() + backoff
+    logger.warning("ComfyUI backend %s marked down for %.0fs after %d failure(s)", url, backoff, backend["failures"])
+
+
+def available_models() -> list[str]:
+    """All models loadable on at least one backend."""
+    models = set()
+    for url in get_backend_urls():
+        models.update(get_models(url) or ())
+    return sorted(models)
+
+
+def status() -> list[dict]:
+    """Per-backend load and health, for diagnostics."""
+    now = time.time()
+    result = []
+    for url in get_backend_urls():
+        depth = queue_depth(url)
+        models = get_models(url)
+        with _lock:
+            backend = _backend(url)
+            result.append({
+                "url": url,
+                "queue": depth,
+                "in_flight": backend["in_flight"],
+                "models": len(models) if models is not None else None,
+                "healthy": backend["down_until"] <= now,
+                "connected": comfy_progress.is_connected(url),
+            })
+    return result
+
+
+def start(config=None) -> None:
+    """Opens the progress websocket to every configured backend."""
+    for url in get_backend_urls(config):
+        comfy_progress.start(url)
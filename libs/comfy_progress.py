@@ -0,0 +1,293 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from websockets.exceptions import WebSocketException
+from websockets.sync.client import connect
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+HISTORY_CHECK_INTERVAL = 15.0
+# While a backend's websocket is down, poll it this often instead.
+DISCONNECTED_CHECK_INTERVAL = 2.0
+FINISHED_TTL = 600.0
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+
+class ExecutionError(RuntimeError):
+    """ComfyUI accepted a prompt but failed while running it."""
+
+
+class BackendUnavailable(ConnectionError):
+    """The backend running a prompt went away or no longer knows the prompt."""
+
+
+# One client ID for the whole process: ComfyUI routes progress events to the
+# client that queued a prompt, so every prompt we queue on a backend shares
+# that backend's socket.
+_client_id = uuid.uuid4().hex
+_condition = threading.Condition()
+_prompts: dict[str, dict] = {}
+_connections: dict[str, dict] = {}
+
+
+def client_id() -> str:
+    return _client_id
+
+
+def is_connected(base_url: str) -> bool:
+    with _condition:
+        connection = _connections.get(base_url.rstrip("/"))
+        return bool(connection and connection["connected"])
+
+
+def _ws_url(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    scheme = "wss" if parts.scheme == "https" else "ws"
+    return urlunsplit((scheme, parts.netloc, "/ws", f"clientId={_client_id}", ""))
+
+
+def _state(prompt_id: str) -> dict:
+    state = _prompts.get(prompt_id)
+    if state is None:
+        state = {"status": PENDING, "node": None, "value": 0, "max": 0, "progress": 0.0,
+                 "error": "", "outputs": {}, "updated": time.time()}
+        _prompts[prompt_id] = state
+    return state
+
+
+def _prune(now: float) -> None:
+    expired = [pid for pid, s in _prompts.items() if s["status"] in (DONE, ERROR) and now - s["updated"] > FINISHED_TTL]
+    for pid in expired:
+        del _prompts[pid]
+
+
+def _handle_message(base_url: str, message: dict) -> None:
+    msg_type = message.get("type")
+    data = message.get("data") or {}
+    prompt_id = data.get("prompt_id")
+
+    with _condition:
+        now = time.time()
+        connection = _connections[base_url]
+        if msg_type == "status":
+            remaining = data.get("status", {}).get("exec_info", {}).get("queue_remaining")
+            if remaining is not None:
+                connection["queue_remaining"] = remaining
+            connection["revision"] += 1
+        elif prompt_id is None:
+            return
+        elif msg_type == "execution_start":
+            _state(prompt_id).update(status=RUNNING, updated=now)
+            connection["revision"] += 1
+        elif msg_type == "executing":
+            state = _state(prompt_id)
+            if data.get("node") is None:
+                state.update(status=DONE, node=None, progress=1.0, updated=now)
+                connection["revision"] += 1
+            else:
+                state.update(status=RUNNING, node=data["node"], updated=now)
+        elif msg_type == "progress":
+            state = _state(prompt_id)
+            value, maximum = data.get("value", 0), data.get("max", 0)
+            state.update(status=RUNNING, value=value, max=maximum, updated=now)
+            if maximum:
+                state["progress"] = min(1.0, value / maximum)
+        elif msg_type == "executed":
+            state = _state(prompt_id)
+            state["outputs"][str(data.get("node"))] = data.get("output") or {}
+            state["updated"] = now
+        elif msg_type == "execution_success":
+            _state(prompt_id).update(status=DONE, progress=1.0, updated=now)
+            connection["revision"] += 1
+        elif msg_type in ("execution_error", "execution_interrupted"):
+            error = data.get("exception_message") or ("Interrupted" if msg_type == "execution_interrupted" else "Execution error")
+            _state(prompt_id).update(status=ERROR, error=str(error).strip(), updated=now)
+            connection["revision"] += 1
+        else:
+            return
+        _prune(now)
+        _condition.notify_all()
+
+
+def _set_connected(base_url: str, connected: bool) -> None:
+    with _condition:
+        connection = _connections[base_url]
+        connection["connected"] = connected
+        connection["revision"] += 1
+        if not connected:
+            connection["queue_remaining"] = None
+        _condition.notify_all()
+
+
+def _run(base_url: str) -> None:
+    delay = RECONNECT_DELAY
+    url = _ws_url(base_url)
+    while True:
+        try:
+            with connect(url, open_timeout=10, max_size=None) as websocket:
+                logger.info("Connected to ComfyUI websocket at %s", url.split("?")[0])
+                _set_connected(base_url, True)
+                delay = RECONNECT_DELAY
+                for raw in websocket:
+                    if isinstance(raw, bytes):
+                        continue  # binary preview frames
+                    try:
+                        _handle_message(base_url, json.loads(raw))
+                    except (ValueError, AttributeError) as e:
+                        logger.debug("Ignoring malformed ComfyUI message: %s", e)
+        except (OSError, WebSocketException, TimeoutError) as e:
+            logger.warning("ComfyUI websocket unavailable (%s), retrying in %.0fs", e, delay)
+        finally:
+            _set_connected(base_url, False)
+        time.sleep(delay)
+        delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+def start(base_url: str) -> None:
+    """Starts the shared websocket listener for a backend (once per process)."""
+    base_url = base_url.rstrip("/")
+    with _condition:
+        if base_url in _connections:
+            return
+        thread = threading.Thread(target=_run, args=(base_url,), name=f"comfyui-progress-{len(_connections)}", daemon=True)
+        _connections[base_url] = {"thread": thread, "connected": False, "queue_remaining": None, "revision": 0}
+    thread.start()
+
+
+def _is_queued(prompt_id: str, base_url: str) -> bool:
+    response = requests.get(f"{base_url}/queue", timeout=5)
+    response.raise_for_status()
+    data = response.json()
+    return any(
+        len(job) > 1 and job[1] == prompt_id
+        for key in ("queue_running", "queue_pending")
+        for job in data.get(key, [])
+    )
+
+
+def _check_history(prompt_id: str, base_url: str) -> None:
+    """Resolves a prompt from /queue and /history when websocket events may have been missed.
+
+    Raises:
+        BackendUnavailable: If the backend cannot be reached while its
+            websocket is down, or lists the prompt neither as queued nor in
+            its history (it restarted and lost it).
+    """
+    try:
+        # /queue first: a prompt that finishes in between is then in /history.
+        if _is_queued(prompt_id, base_url):
+            return
+        response = requests.get(f"{base_url}/history/{prompt_id}", timeout=5)
+        response.raise_for_status()
+        entry = response.json().get(prompt_id)
+    except (requests.RequestException, ValueError) as e:
+        if not is_connected(base_url):
+            raise BackendUnavailable(f"ComfyUI at {base_url} is unreachable: {e}") from e
+        logger.debug("History check for %s failed: %s", prompt_id, e)
+        return
+    if not entry:
+        raise BackendUnavailable(f"ComfyUI at {base_url} no longer knows prompt {prompt_id}")
+
+    status = entry.get("status", {})
+    with _condition:
+        state = _state(prompt_id)
+        if status.get("status_str") == "error":
+            state.update(status=ERROR, error=state["error"] or "Execution error", updated=time.time())
+        elif status.get("completed", True):
+            for node_id, output in entry.get("outputs", {}).items():
+                state["outputs"].setdefault(str(node_id), output)
+            state.update(status=DONE, progress=1.0, updated=time.time())
+        _condition.notify_all()
+
+
+def get_progress(prompt_id: str) -> dict | None:
+    with _condition:
+        state = _prompts.get(prompt_id)
+        return dict(state) if state else None
+
+
+def wait(prompt_id: str, base_url: str, timeout: float | None = None, on_progress=None) -> dict:
+    """Blocks until ComfyUI finishes ``prompt_id`` and returns its final state.
+
+    Progress comes from the shared websocket; /queue and /history are
+    checked now and then as a fallback, and every few seconds while the
+    socket is down, so a dropped connection or a dead backend never leaves
+    a job hanging.
+
+    Args:
+        prompt_id: ID returned by ComfyUI's /prompt endpoint.
+        base_url: The backend the prompt was queued on.
+        timeout: Give up after this many seconds (None waits forever).
+        on_progress: Optional callable receiving a 0..1 fraction on updates.
+
+    Raises:
+        ExecutionError: If ComfyUI reported an execution error.
+        BackendUnavailable: If the backend went away or lost the prompt.
+        TimeoutError: If the prompt did not finish in time.
+    """
+    base_url = base_url.rstrip("/")
+    start(base_url)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    last_progress = None
+    last_check = time.monotonic()
+
+    def next_check() -> float:
+        interval = HISTORY_CHECK_INTERVAL if is_connected(base_url) else DISCONNECTED_CHECK_INTERVAL
+        return last_check + interval
+
+    while True:
+        with _condition:
+            state = _state(prompt_id)
+            if state["status"] not in (DONE, ERROR):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"ComfyUI prompt {prompt_id} did not finish in time")
+                slice_timeout = max(0.0, next_check() - time.monotonic())
+                _condition.wait(slice_timeout if remaining is None else min(remaining, slice_timeout))
+                state = _state(prompt_id)
+            snapshot = dict(state)
+
+        if on_progress is not None and snapshot["progress"] != last_progress:
+            last_progress = snapshot["progress"]
+            try:
+                on_progress(last_progress)
+            except Exception as e:
+                logger.debug("Progress callback failed: %s", e)
+
+        if snapshot["status"] == DONE:
+            return snapshot
+        if snapshot["status"] == ERROR:
+            raise ExecutionError(f"ComfyUI failed to run prompt {prompt_id}: {snapshot['error']}")
+        if time.monotonic() >= next_check():
+            _check_history(prompt_id, base_url)
+            last_check = time.monotonic()
+
+
+def queue_state(base_url: str) -> tuple[int | None, int]:
+    """Returns a backend's (queue_remaining, revision) as last reported over its websocket.
+
+    ``queue_remaining`` is None while the socket is down or has not reported
+    a status yet, and ``revision`` increases whenever the queue may have changed.
+    """
+    with _condition:
+        connection = _connections.get(base_url.rstrip("/"))
+        if connection is None:
+            return None, 0
+        return connection["queue_remaining"], connection["revision"]
+
+
+def running_progress() -> dict[str, float]:
+    """Maps prompt IDs currently executing to their 0..1 progress."""
+    with _condition:
+        return {pid: s["progress"] for pid, s in _prompts.items() if s["status"] == RUNNING}
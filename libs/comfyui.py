@@ -1,128 +1,188 @@
 import logging
 import os
 import random
-import time
+import threading
+import uuid
 import requests
 from typing import Optional
-from comfy_api_simplified import ComfyApiWrapper, ComfyWorkflowWrapper
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_fixed,
-    before_log,
-    retry_if_exception_type,
-)
-from libs.generic import rename_image, load_config, save_prompt, get_bool
-from libs.create_thumbnail import generate_thumbnail
+from comfy_api_simplified import ComfyApiWrapper
+from libs.generic import rename_image, get_config_snapshot, save_prompt, new_image_filename
+from libs.create_thumbnail import generate_derivatives, rename_display_rendition, rename_thumbnails
+from libs.catalog import upsert_image
+from libs.events import publish_image
+from libs import comfy_pool, comfy_progress
+from libs.workflows import instantiate
 
 logger = logging.getLogger(__name__)
 
-AVAILABLE_MODELS_CACHE = None
-AVAILABLE_MODELS_CACHE_TIME = 0
-AVAILABLE_MODELS_CACHE_TTL = 300
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Longest a single render may take before it is given up and failed over.
+RENDER_TIMEOUT = 1800.0
+
+_publish_lock = threading.Lock()
 
 
 def get_available_models() -> list:
-    global AVAILABLE_MODELS_CACHE, AVAILABLE_MODELS_CACHE_TIME
+    return comfy_pool.available_models()
 
-    if AVAILABLE_MODELS_CACHE is not None and (time.time() - AVAILABLE_MODELS_CACHE_TIME) < AVAILABLE_MODELS_CACHE_TTL:
-        return AVAILABLE_MODELS_CACHE
 
-    config = load_config()
-    url = config["comfyui"]["comfyui_url"] + "/object_info"
+def cancel_current_job() -> str:
+    cancelled = False
+    for url in comfy_pool.get_backend_urls():
+        try:
+            response = requests.post(url + "/interrupt", timeout=5)
+            cancelled = cancelled or response.status_code == 200
+        except requests.RequestException as e:
+            logger.warning("Failed to interrupt %s: %s", url, e)
+    return "Cancelled" if cancelled else "Failed to cancel"
+
+
+def _submit(workflow: dict, model: Optional[str], tried: list[str], prefer: str | None = None) -> tuple[str, str]:
+    """Queues a workflow on the best backend not yet in ``tried``, failing over on errors.
+
+    Returns:
+        (backend_url, prompt_id). The backend's pool slot stays reserved
+        until the caller releases it.
+    """
+    while True:
+        base_url = comfy_pool.acquire(model, exclude=tried, prefer=prefer)
+        if base_url is None:
+            raise RuntimeError(f"All ComfyUI backends failed: {', '.join(tried)}")
+        tried.append(base_url)
+        try:
+            api = ComfyApiWrapper(base_url)
+            return base_url, api.queue_prompt(workflow, client_id=comfy_progress.client_id())["prompt_id"]
+        except Exception as e:
+            comfy_pool.release(base_url, ok=False)
+            logger.warning("Queueing on %s failed, trying the next backend: %s", base_url, e)
+
+
+def _collect(base_url: str, prompt_id: str, output_node: str, output_dir: str, on_progress=None) -> list[str]:
+    """Waits (up to RENDER_TIMEOUT) for a queued prompt and streams its output images to temp files."""
+    state = comfy_progress.wait(prompt_id, base_url, timeout=RENDER_TIMEOUT, on_progress=on_progress)
+    output = state["outputs"].get(output_node)
+    if output is None:
+        output = ComfyApiWrapper(base_url).get_history(prompt_id)[prompt_id]["outputs"][output_node]
+
+    downloads = []
     try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            general = data.get("CheckpointLoaderSimple", {}).get("input", {}).get("required", {}).get("ckpt_name", [[]])[0]
-            flux = data.get("UnetLoaderGGUF", {}).get("input", {}).get("required", {}).get("unet_name", [[]])[0]
-            all_models = []
-            if isinstance(general, list):
-                all_models.extend(general)
-            if isinstance(flux, list):
-                all_models.extend(flux)
-            AVAILABLE_MODELS_CACHE = all_models
-            AVAILABLE_MODELS_CACHE_TIME = time.time()
-            return all_models
-        else:
-            logger.warning("Failed to fetch models: %s", response.status_code)
-            return []
-    except Exception as e:
-        logger.error("Error fetching models: %s", e)
-        if AVAILABLE_MODELS_CACHE is not None:
-            return AVAILABLE_MODELS_CACHE
-        return []
+        for image in output.get("images", []):
+            downloads.append(_download_image(base_url, image, output_dir))
+    except BaseException:
+        for temp_path in downloads:
+            os.remove(temp_path)
+        raise
+    return downloads
+
+
+def _render(workflow: dict, output_node: str, model: Optional[str], output_dir: str,
+            on_progress=None, submitted: tuple[str, str] | None = None, tried: list[str] | None = None,
+            prefer: str | None = None) -> list[str]:
+    """Runs a workflow to completion, moving to another backend whenever one fails.
+
+    Args:
+        submitted: (backend_url, prompt_id) if the workflow is already queued.
+        tried: Backends already used for this workflow.
+        prefer: Backend to use while it is healthy; see comfy_pool.acquire().
+
+    Returns:
+        Temp file paths of the downloaded output images.
+    """
+    tried = [] if tried is None else tried
+    while True:
+        base_url, prompt_id = submitted or _submit(workflow, model, tried, prefer)
+        submitted = None
+        try:
+            downloads = _collect(base_url, prompt_id, output_node, output_dir, on_progress)
+        except Exception as e:
+            # A workflow that fails to execute is not the backend's fault,
+            # so only connection-level errors put it into backoff.
+            comfy_pool.release(base_url, ok=isinstance(e, comfy_progress.ExecutionError))
+            logger.warning("Render on %s failed, trying the next backend: %s", base_url, e)
+            continue
+        comfy_pool.release(base_url)
+        return downloads
+
+
+def _download_image(base_url: str, image: dict, output_dir: str) -> str:
+    """Streams an output image from /view into a temp file in ``output_dir`` and returns its path."""
+    params = {"filename": image["filename"], "subfolder": image["subfolder"], "type": image["type"]}
+    temp_path = os.path.join(output_dir, f".download-{uuid.uuid4().hex}.png")
+    try:
+        with requests.get(base_url + "/view", params=params, stream=True, timeout=(5, 60)) as response:
+            response.raise_for_status()
+            with open(temp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path
 
 
-def cancel_current_job() -> str:
-    config = load_config()
-    url = config["comfyui"]["comfyui_url"] + "/interrupt"
-    response = requests.post(url)
-    if response.status_code == 200:
-        return "Cancelled"
-    else:
-        return "Failed to cancel"
+def _publish_image(temp_path: str, output_path: str, output_dir: str) -> None:
+    # Jobs finish concurrently; archiving the previous image.png and moving
+    # the new one into place must not interleave.
+    with _publish_lock:
+        rename_image()
+        os.replace(temp_path, output_path)
+        generate_derivatives(output_path)
+        upsert_image(output_path)
+        publish_image(output_dir)
+
+
+def promote_ready_image(ready_path: str, output_dir: str) -> None:
+    """Makes a pre-rendered image the current image.png by renaming it and its derivatives."""
+    output_path = os.path.join(output_dir, "image.png")
+    with _publish_lock:
+        rename_image()
+        os.replace(ready_path, output_path)
+        rename_thumbnails(ready_path, output_path)
+        rename_display_rendition(ready_path, output_path)
+        upsert_image(output_path)
+        publish_image(output_dir)
+
+
+def _archive_image(temp_path: str, output_dir: str) -> str:
+    """Moves a finished render straight into the gallery under a unique name."""
+    filename = new_image_filename()
+    path = os.path.join(output_dir, filename)
+    os.replace(temp_path, path)
+    generate_derivatives(path)
+    upsert_image(path)
+    return filename
+
+
+def _build_workflow(snapshot, workflow_name: str, comfy_prompt: str, file_name: str, model: Optional[str]) -> tuple[dict, str]:
+    return instantiate(
+        workflow_name,
+        prompt=comfy_prompt,
+        seed=random.getrandbits(32),
+        filename_prefix=file_name,
+        model=model,
+        width=snapshot.width,
+        height=snapshot.height,
+    )
 
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_fixed(5),
-    before=before_log(logging.getLogger(), logging.DEBUG),
-    retry=retry_if_exception_type(Exception),
-)
 def generate_image(
     file_name: str,
     comfy_prompt: str,
-    workflow_path: str = "./workflow_sdxl.json",
-    prompt_node: str = "Positive",
-    seed_node: str = "KSampler",
-    seed_param: str = "seed",
-    save_node: str = "Save Image",
-    save_param: str = "filename_prefix",
-    model_node: Optional[str] = "Load Checkpoint",
-    model_param: Optional[str] = "ckpt_name",
-    model: Optional[str] = "None",
+    workflow_name: str = "SDXL",
+    model: Optional[str] = None,
+    on_progress=None,
+    backend: str | None = None,
 ) -> None:
-    config = load_config()
+    snapshot = get_config_snapshot()
     try:
-        api = ComfyApiWrapper(config["comfyui"]["comfyui_url"])
-        wf = ComfyWorkflowWrapper(workflow_path)
-
-        wf.set_node_param(seed_node, seed_param, random.getrandbits(32))
-        wf.set_node_param(prompt_node, "text", comfy_prompt)
-        wf.set_node_param(save_node, save_param, file_name)
-        wf.set_node_param(
-            (
-                "Empty Latent Image"
-                if workflow_path.endswith("workflow_sdxl.json")
-                else "CR Aspect Ratio"
-            ),
-            "width",
-            config["comfyui"]["width"],
-        )
-        wf.set_node_param(
-            (
-                "Empty Latent Image"
-                if workflow_path.endswith("workflow_sdxl.json")
-                else "CR Aspect Ratio"
-            ),
-            "height",
-            config["comfyui"]["height"],
-        )
-
-        wf.set_node_param(model_node, model_param, model)
+        workflow, output_node = _build_workflow(snapshot, workflow_name, comfy_prompt, file_name, model)
 
         logger.debug("Generating image: %s", file_name)
-        results = api.queue_and_wait_images(wf, save_node)
-        rename_image()
-
-        for _, image_data in results.items():
-            output_path = os.path.join(
-                config["comfyui"]["output_dir"], f"{file_name}.png"
-            )
-            with open(output_path, "wb+") as f:
-                f.write(image_data)
-            generate_thumbnail(output_path)
+        output_dir = snapshot.output_dir
+        output_path = os.path.join(output_dir, f"{file_name}.png")
+        for temp_path in _render(workflow, output_node, model, output_dir, on_progress, prefer=backend):
+            _publish_image(temp_path, output_path, output_dir)
 
         logger.debug("Image generated successfully for UID: %s", file_name)
 
@@ -131,11 +191,100 @@ def generate_image(
         raise
 
 
+def generate_images(
+    comfy_prompts: list[str],
+    workflow_name: str = "SDXL",
+    model: Optional[str] = None,
+    on_progress=None,
+    backend: str | None = None,
+    on_item_done=None,
+) -> int:
+    """Renders several prompts as one pipelined batch.
+
+    Every prompt is queued up front, on ``backend`` if given and healthy or
+    else spread over the backend pool, so the GPUs go straight from one
+    render to the next instead of idling through a round trip per image.
+    Outputs are collected in submission order: all but the last go straight
+    into the gallery under unique names, and the last one becomes the
+    frame's image.png. A prompt whose render fails on every backend is
+    skipped.
+
+    Args:
+        on_item_done: Called with a prompt's index once all of its images
+            are in place, so a retried batch can skip it.
+
+    Returns:
+        The number of images produced.
+
+    Raises:
+        RuntimeError: If no image at all could be produced.
+    """
+    snapshot = get_config_snapshot()
+    output_dir = snapshot.output_dir
+    fractions = [0.0] * len(comfy_prompts)
+
+    def item_progress(index):
+        def report(fraction):
+            fractions[index] = fraction
+            if on_progress is not None:
+                on_progress(sum(fractions) / len(fractions))
+        return report
+
+    def item_done(index):
+        if on_item_done is not None:
+            on_item_done(index)
+
+    items = []
+    for index, comfy_prompt in enumerate(comfy_prompts):
+        workflow, output_node = _build_workflow(snapshot, workflow_name, comfy_prompt, "batch", model)
+        tried = []
+        try:
+            submitted = _submit(workflow, model, tried, backend)
+        except RuntimeError as e:
+            logger.error("Could not queue batch prompt: %s", e)
+            continue
+        items.append((index, workflow, output_node, submitted, tried))
+    logger.info("Queued a batch of %d prompt(s)", len(items))
+
+    produced = 0
+    # The newest finished item is held back so its last image can become image.png.
+    latest: tuple[int, list[str]] | None = None
+    try:
+        for index, workflow, output_node, submitted, tried in items:
+            try:
+                downloads = _render(workflow, output_node, model, output_dir, item_progress(index), submitted, tried, backend)
+            except RuntimeError as e:
+                logger.error("Batch render failed: %s", e)
+                continue
+            if not downloads:
+                continue
+            if latest is not None:
+                for temp_path in latest[1]:
+                    _archive_image(temp_path, output_dir)
+                item_done(latest[0])
+            latest = (index, downloads)
+            produced += len(downloads)
+
+        if latest is None:
+            raise RuntimeError("No image in the batch could be generated")
+        for temp_path in latest[1][:-1]:
+            _archive_image(temp_path, output_dir)
+        _publish_image(latest[1][-1], os.path.join(output_dir, "image.png"), output_dir)
+        item_done(latest[0])
+    except BaseException:
+        for temp_path in latest[1] if latest is not None else ():
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        raise
+    logger.info("Batch finished with %d image(s)", produced)
+    return produced
+
+
 def select_model(model: str) -> tuple[str, str]:
-    config = load_config()
-    use_flux = get_bool(config, "comfyui", "flux", False)
-    only_flux = get_bool(config, "comfyui", "only_flux", False)
-    use_qwen = get_bool(config, "comfyui", "qwen", False)
+    snapshot = get_config_snapshot()
+    use_flux = snapshot.use_flux
+    only_flux = snapshot.only_flux
+    use_qwen = snapshot.use_qwen
 
     if model == "Random Image Model":
         available_workflows = []
@@ -159,28 +308,28 @@ def select_model(model: str) -> tuple[str, str]:
 
     if model == "Random Image Model":
         if selected_workflow == "FLUX":
-            valid_models = [m.strip() for m in config["comfyui:flux"]["models"].split(",") if m.strip()]
+            valid_models = list(snapshot.flux_models)
         elif selected_workflow == "Qwen":
-            valid_models = [m.strip() for m in config["comfyui:qwen"]["models"].split(",") if m.strip()]
+            valid_models = list(snapshot.qwen_models)
         else:
-            available_model_list = [m.strip() for m in config["comfyui"]["models"].split(",") if m.strip()]
+            available_model_list = list(snapshot.sdxl_models)
             valid_models = list(set(get_available_models()) & set(available_model_list))
             if not valid_models:
                 valid_models = available_model_list
         if not valid_models:
-            fallback_models = [m.strip() for m in config["comfyui"]["models"].split(",") if m.strip()]
+            fallback_models = snapshot.sdxl_models
             valid_models = fallback_models[:1] if fallback_models else ["sd_xl_base_1.0.safetensors"]
         model = random.choice(valid_models)
 
     return selected_workflow, model
 
 
-def create_image(prompt: str | None = None, model: str = "Random Image Model", topic: str = "") -> None:
+def create_image(prompt: str | None = None, model: str = "Random Image Model", topic: str = "", on_progress=None,
+                 backend: str | None = None) -> None:
+    """Renders a prompt as the frame's image.png. Logging the prompt is left to the caller (see jobs._run_job)."""
     if prompt is None:
         from libs.generic import create_prompt_with_random_model
-        config = load_config()
-        base_prompt = config["comfyui"].get("prompt", "Generate a random detailed prompt for stable diffusion.")
-        prompt, _ = create_prompt_with_random_model(base_prompt)
+        prompt, _ = create_prompt_with_random_model(get_config_snapshot().base_prompt)
         if not prompt:
             logger.error("Failed to generate a prompt.")
             return
@@ -189,63 +338,83 @@ def create_image(prompt: str | None = None, model: str = "Random Image Model", t
         logger.error("No prompt generated.")
         return
 
-    save_prompt(prompt, topic)
     selected_workflow, model = select_model(model)
 
-    if selected_workflow == "FLUX":
-        generate_image(
-            file_name="image",
-            comfy_prompt=prompt,
-            workflow_path="./workflow_flux.json",
-            prompt_node="CLIP Text Encode (Positive Prompt)",
-            seed_node="RandomNoise",
-            seed_param="noise_seed",
-            save_node="Save Image",
-            save_param="filename_prefix",
-            model_node="UnetLoaderGGUFDisTorchMultiGPU",
-            model_param="unet_name",
-            model=model
-        )
-    elif selected_workflow == "Qwen":
-        generate_image(
-            file_name="image",
-            comfy_prompt=prompt,
-            workflow_path="./workflow_qwen.json",
-            prompt_node="Positive",
-            seed_node="KSampler",
-            seed_param="seed",
-            save_node="Save Image",
-            save_param="filename_prefix",
-            model_node="Load Checkpoint",
-            model_param="ckpt_name",
-            model=model
-        )
-    else:
-        generate_image("image", comfy_prompt=prompt, model=model)
+    generate_image("image", comfy_prompt=prompt, workflow_name=selected_workflow, model=model, on_progress=on_progress,
+                   backend=backend)
 
     logger.info("%s generation started with prompt: %s", selected_workflow, prompt)
 
 
-def get_queue_count() -> int:
-    config = load_config()
-    url = config["comfyui"]["comfyui_url"] + "/queue"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        pending = len(data.get("queue_pending", []))
-        running = len(data.get("queue_running", []))
-        return pending + running
-    except Exception as e:
-        logger.error("Error fetching queue count: %s", e)
+def render_images(prompt: str, model: str = "Random Image Model", output_dir: str | None = None) -> list[str]:
+    """Renders a prompt without publishing it.
+
+    Returns:
+        Temp file paths of the output images in ``output_dir`` (defaults to
+        the configured output directory); the caller moves them into place.
+    """
+    snapshot = get_config_snapshot()
+    output_dir = output_dir or snapshot.output_dir
+    selected_workflow, model = select_model(model)
+    save_prompt(prompt, model=model)
+    workflow, output_node = _build_workflow(snapshot, selected_workflow, prompt, "ready", model)
+    return _render(workflow, output_node, model, output_dir)
+
+
+def create_images(prompts: list[str], model: str = "Random Image Model", topic: str = "", on_progress=None,
+                  backend: str | None = None, on_item_done=None) -> int:
+    """Renders a batch of prompts with one model; see generate_images().
+
+    ``on_item_done`` receives indexes into ``prompts``. As with
+    create_image(), the caller logs the prompts.
+    """
+    positions = [i for i, prompt in enumerate(prompts) if prompt]
+    prompts = [prompts[i] for i in positions]
+    if not prompts:
+        logger.error("No prompts for the batch.")
         return 0
 
+    selected_workflow, model = select_model(model)
+    logger.info("%s batch of %d started", selected_workflow, len(prompts))
+    return generate_images(
+        prompts, workflow_name=selected_workflow, model=model, on_progress=on_progress, backend=backend,
+        on_item_done=(lambda index: on_item_done(positions[index])) if on_item_done is not None else None,
+    )
+
+
+def get_queue_count() -> int:
+    return sum(comfy_pool.queue_depth(url) for url in comfy_pool.get_backend_urls())
+
+
+_QUEUE_DETAILS_CACHE: dict[str, tuple[int, list]] = {}
+
 
 def get_queue_details() -> list:
-    config = load_config()
-    url = config["comfyui"]["comfyui_url"] + "/queue"
+    """Lists running and pending prompts on every backend with live progress.
+
+    While a backend's websocket is connected, its /queue is only re-fetched
+    after the socket reports a queue change, so any number of open create
+    pages polling this cost nothing extra.
+    """
+    progress = comfy_progress.running_progress()
+    jobs = []
+    for url in comfy_pool.get_backend_urls():
+        remaining, revision = comfy_progress.queue_state(url)
+        cache = _QUEUE_DETAILS_CACHE.get(url)
+        if remaining is not None and cache is not None and cache[0] == revision:
+            backend_jobs = cache[1]
+        else:
+            backend_jobs = _fetch_queue_details(url)
+            if backend_jobs is not None and remaining is not None:
+                _QUEUE_DETAILS_CACHE[url] = (revision, backend_jobs)
+        jobs.extend(dict(job, backend=url, progress=progress.get(job["prompt_id"])) for job in backend_jobs or [])
+    return jobs
+
+
+def _fetch_queue_details(base_url: str) -> list | None:
+    url = base_url + "/queue"
     try:
-        response = requests.get(url)
+        response = requests.get(url, timeout=5)
         response.raise_for_status()
         data = response.json()
         jobs = []
@@ -272,10 +441,11 @@ def get_queue_details() -> list:
                 model_display = model.split(".")[0] if model != "Unknown" else model
                 jobs.append({
                     "id": job[0],
+                    "prompt_id": job[1],
                     "model": model_display,
                     "prompt": prompt
                 })
         return jobs
     except Exception as e:
-        logger.error("Error fetching queue details: %s", e)
-        return []
\ No newline at end of file
+        logger.error("Error fetching queue details from %s: %s", base_url, e)
+        return None
\ No newline at end of file
@@ -1,40 +1,248 @@
 import logging
 import os
-from PIL import Image
+from PIL import Image, features
 
 logger = logging.getLogger(__name__)
 
-def generate_thumbnail(image_path: str, size=(500, 500)) -> str:
+DEFAULT_TIERS = (256, 500, 1024)
+FALLBACK_SIZE = (500, 500)
+DEFAULT_FORMAT = "webp"
+DEFAULT_QUALITY = 80
+FORMAT_MIMETYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+DEFAULT_DISPLAY_SIZE = (1920, 1080)
+DEFAULT_DISPLAY_FORMAT = "jpeg"
+DEFAULT_DISPLAY_QUALITY = 85
+DISPLAY_EXTENSIONS = {"jpeg": "jpg", "webp": "webp"}
+DISPLAY_MIMETYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def get_thumbnail_settings(config=None) -> tuple[tuple[int, ...], str, int]:
+    """Returns the configured (tiers, format, quality) for thumbnail variants."""
+    if config is None:
+        from libs.generic import load_config
+        config = load_config()
+
+    raw_tiers = config.get("thumbnails", "sizes", fallback=",".join(str(t) for t in DEFAULT_TIERS))
+    tiers = []
+    for value in raw_tiers.split(","):
+        try:
+            tier = int(value.strip())
+        except ValueError:
+            continue
+        if tier > 0:
+            tiers.append(tier)
+
+    fmt = config.get("thumbnails", "format", fallback=DEFAULT_FORMAT).strip().lower()
+    if fmt not in FORMAT_MIMETYPES or not features.check(fmt):
+        if fmt:
+            logger.warning("Thumbnail format '%s' is not supported here, using %s", fmt, DEFAULT_FORMAT)
+        fmt = DEFAULT_FORMAT
+
+    quality = config.getint("thumbnails", "quality", fallback=DEFAULT_QUALITY)
+    return tuple(sorted(set(tiers))), fmt, quality
+
+
+def get_thumbnail_path(image_path: str) -> str:
+    image_dir = os.path.dirname(image_path)
+    return os.path.join(image_dir, "thumbnails", os.path.basename(image_path))
+
+
+def get_variant_path(image_path: str, tier: int, fmt: str) -> str:
+    image_dir = os.path.dirname(image_path)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(image_dir, "thumbnails", str(tier), f"{stem}.{fmt}")
+
+
+def _all_thumbnail_paths(image_path: str, tiers, fmt: str) -> list[str]:
+    return [get_thumbnail_path(image_path)] + [get_variant_path(image_path, tier, fmt) for tier in tiers]
+
+
+def is_thumbnail_current(image_path: str, thumbnail_path: str | None = None, tiers=None, fmt: str | None = None) -> bool:
+    """Returns True if the thumbnail and every configured variant are at least as new as the image."""
+    if tiers is None or fmt is None:
+        tiers, fmt, _ = get_thumbnail_settings()
+    paths = [thumbnail_path or get_thumbnail_path(image_path)] + [get_variant_path(image_path, t, fmt) for t in tiers]
+    return _is_current(image_path, paths)
+
+
+def _is_current(image_path: str, derived_paths: list[str]) -> bool:
+    try:
+        image_mtime = os.path.getmtime(image_path)
+        return all(os.path.getmtime(path) >= image_mtime for path in derived_paths)
+    except OSError:
+        return False
+
+
+def _save_atomic(img: Image.Image, path: str, **save_args) -> None:
+    directory, filename = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".tmp-{os.getpid()}-{filename}")
+    try:
+        img.save(temp_path, **save_args)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def generate_thumbnail(image_path: str, size=FALLBACK_SIZE, force: bool = False, tiers=None, fmt: str | None = None, quality: int | None = None) -> str:
     """Generates a thumbnail for a given image with a max size of 500x500,
     and saves it in a 'thumbnails' subdirectory alongside the original.
 
-    If the filename includes the word "image", the thumbnail will always be overwritten.
+    Alongside that PNG fallback, one variant per configured size tier is
+    written to 'thumbnails/<tier>/<name>.<format>' (WebP by default). All of
+    them are derived from a single decode of the original, largest first.
+
+    The thumbnails are only rebuilt when missing or older than the image,
+    so an overwritten image.png always gets fresh ones. Each file is written
+    to a temporary name and renamed into place, so an interrupted run never
+    leaves a partial thumbnail that looks up to date.
 
     Args:
         image_path: Path to the original image.
-        size: Maximum width and height of the thumbnail.
+        size: Maximum width and height of the PNG fallback thumbnail.
+        force: Rebuild the thumbnails even if they are up to date.
+        tiers: Variant sizes to build; defaults to the [thumbnails] config.
+        fmt: Variant format ("webp" or "avif"); defaults to the config.
+        quality: Variant encoder quality; defaults to the config.
 
     Returns:
-        Path to the thumbnail image.
+        Path to the PNG fallback thumbnail.
     """
-    image_dir = os.path.dirname(image_path)
-    thumbnail_dir = os.path.join(image_dir, "thumbnails")
-    os.makedirs(thumbnail_dir, exist_ok=True)
+    if tiers is None or fmt is None or quality is None:
+        cfg_tiers, cfg_fmt, cfg_quality = get_thumbnail_settings()
+        tiers = cfg_tiers if tiers is None else tiers
+        fmt = cfg_fmt if fmt is None else fmt
+        quality = cfg_quality if quality is None else quality
 
-    filename = os.path.basename(image_path)
-    thumbnail_path = os.path.join(thumbnail_dir, filename)
+    thumbnail_path = get_thumbnail_path(image_path)
 
-    should_overwrite = "image" in filename.lower()
-
-    if not os.path.exists(thumbnail_path) or should_overwrite:
+    if force or not is_thumbnail_current(image_path, thumbnail_path, tiers, fmt):
         try:
-            img = Image.open(image_path)
-            img.thumbnail(size, Image.Resampling.LANCZOS)
-            img.save(thumbnail_path, optimize=True)
+            with Image.open(image_path) as img:
+                img.load()
+                _write_thumbnails(img, image_path, size, tiers, fmt, quality)
             logger.info("Created thumbnail: %s", thumbnail_path)
         except Exception as e:
             logger.warning("Error creating thumbnail for %s: %s", image_path, e)
     else:
         logger.debug("Thumbnail already exists: %s", thumbnail_path)
 
-    return thumbnail_path
\ No newline at end of file
+    return thumbnail_path
+
+
+def _write_thumbnails(img: Image.Image, image_path: str, size, tiers, fmt: str, quality: int) -> None:
+    source = img
+    for tier in sorted(tiers, reverse=True):
+        variant = source.copy()
+        variant.thumbnail((tier, tier), Image.Resampling.LANCZOS)
+        if variant.mode not in ("RGB", "RGBA"):
+            variant = variant.convert("RGBA" if "A" in variant.getbands() else "RGB")
+        _save_atomic(variant, get_variant_path(image_path, tier, fmt), format=fmt.upper(), quality=quality)
+        if tier >= max(size):
+            source = variant
+
+    fallback = source.copy()
+    fallback.thumbnail(size, Image.Resampling.LANCZOS)
+    _save_atomic(fallback, get_thumbnail_path(image_path), format=img.format or "PNG")
+
+
+def rename_thumbnails(old_image_path: str, new_image_path: str) -> None:
+    """Moves existing thumbnails along with a renamed image instead of re-encoding them."""
+    tiers, fmt, _ = get_thumbnail_settings()
+    for old_path, new_path in zip(_all_thumbnail_paths(old_image_path, tiers, fmt), _all_thumbnail_paths(new_image_path, tiers, fmt)):
+        _move(old_path, new_path)
+
+
+def _move(old_path: str, new_path: str) -> None:
+    if not os.path.exists(old_path):
+        return
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    try:
+        os.replace(old_path, new_path)
+    except FileNotFoundError:
+        pass
+
+
+def get_display_settings(config=None) -> tuple[tuple[int, int], str, int]:
+    """Returns the configured ((width, height), format, quality) for frame display renditions."""
+    if config is None:
+        from libs.generic import load_config
+        config = load_config()
+
+    width = config.getint("frame", "display_width", fallback=DEFAULT_DISPLAY_SIZE[0])
+    height = config.getint("frame", "display_height", fallback=DEFAULT_DISPLAY_SIZE[1])
+    fmt = config.get("frame", "display_format", fallback=DEFAULT_DISPLAY_FORMAT).strip().lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in DISPLAY_EXTENSIONS:
+        logger.warning("Display format '%s' is not supported, using %s", fmt, DEFAULT_DISPLAY_FORMAT)
+        fmt = DEFAULT_DISPLAY_FORMAT
+    quality = config.getint("frame", "display_quality", fallback=DEFAULT_DISPLAY_QUALITY)
+    return (max(1, width), max(1, height)), fmt, quality
+
+
+def get_display_path(image_path: str, size: tuple[int, int], fmt: str) -> str:
+    image_dir = os.path.dirname(image_path)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(image_dir, "display", f"{size[0]}x{size[1]}", f"{stem}.{DISPLAY_EXTENSIONS[fmt]}")
+
+
+def generate_display_rendition(image_path: str, force: bool = False, settings=None) -> str | None:
+    """Writes a pre-scaled, compressed copy of an image sized for the frame.
+
+    Renditions live in 'display/<width>x<height>/' next to the original, so
+    changing the configured frame size never serves a stale one. The image
+    is scaled down to fit the frame (never up) and re-encoded as JPEG or
+    WebP, and an existing rendition newer than the source is reused.
+
+    Args:
+        image_path: Path to the original image.
+        force: Rebuild the rendition even if it is up to date.
+        settings: Optional (size, format, quality); defaults to the [frame] config.
+
+    Returns:
+        Path to the rendition, or None if it could not be created.
+    """
+    size, fmt, quality = settings or get_display_settings()
+    display_path = get_display_path(image_path, size, fmt)
+
+    if not force and _is_current(image_path, [display_path]):
+        return display_path
+
+    try:
+        with Image.open(image_path) as img:
+            _write_display_rendition(img, display_path, size, fmt, quality)
+        logger.info("Created display rendition: %s", display_path)
+        return display_path
+    except Exception as e:
+        logger.warning("Error creating display rendition for %s: %s", image_path, e)
+        return None
+
+
+def _write_display_rendition(img: Image.Image, display_path: str, size, fmt: str, quality: int) -> None:
+    """Scales ``img`` down in place and saves it; callers must not reuse it afterwards."""
+    img.thumbnail(size, Image.Resampling.LANCZOS)
+    rendition = img.convert("RGB") if fmt == "jpeg" or img.mode not in ("RGB", "RGBA") else img
+    _save_atomic(rendition, display_path, format=fmt.upper(), quality=quality, optimize=fmt == "jpeg")
+
+
+def generate_derivatives(image_path: str) -> None:
+    """Builds the thumbnails and the display rendition of a new image from a single decode."""
+    tiers, fmt, quality = get_thumbnail_settings()
+    display_size, display_fmt, display_quality = get_display_settings()
+    try:
+        with Image.open(image_path) as img:
+            img.load()
+            _write_thumbnails(img, image_path, FALLBACK_SIZE, tiers, fmt, quality)
+            _write_display_rendition(img, get_display_path(image_path, display_size, display_fmt),
+                                     display_size, display_fmt, display_quality)
+        logger.info("Created thumbnails and display rendition for %s", image_path)
+    except Exception as e:
+        logger.warning("Error creating derivatives for %s: %s", image_path, e)
+
+
+def rename_display_rendition(old_image_path: str, new_image_path: str) -> None:
+    size, fmt, _ = get_display_settings()
+    _move(get_display_path(old_image_path, size, fmt), get_display_path(new_image_path, size, fmt))
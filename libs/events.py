@@ -0,0 +1,92 @@
+import logging
+import os
+import threading
+import time
+
+from libs.generic import load_config, get_details_from_png
+
+logger = logging.getLogger(__name__)
+
+CURRENT_IMAGE = "image.png"
+
+_condition = threading.Condition()
+_latest: dict | None = None
+
+
+def _output_dir() -> str:
+    return load_config()["comfyui"]["output_dir"].rstrip("/")
+
+
+def _image_version(path: str) -> str | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def _read_current_image(output_dir: str | None = None) -> dict | None:
+    path = os.path.join(output_dir or _output_dir(), CURRENT_IMAGE)
+    version = _image_version(path)
+    if version is None:
+        return None
+    details = get_details_from_png(path)
+    return {"filename": CURRENT_IMAGE, "version": version, "prompt": details.get("p", "")}
+
+
+def _store(event: dict | None) -> dict | None:
+    global _latest
+    with _condition:
+        if event is not None and (_latest is None or _latest["version"] != event["version"]):
+            _latest = event
+            _condition.notify_all()
+        return _latest
+
+
+def publish_image(output_dir: str | None = None) -> dict | None:
+    """Announces that image.png has changed to every waiting frame."""
+    event = _read_current_image(output_dir)
+    if event is not None:
+        logger.info("Publishing new frame image version %s", event["version"])
+    return _store(event)
+
+
+def current_image() -> dict | None:
+    with _condition:
+        latest = _latest
+    if latest is None:
+        return _store(_read_current_image())
+    return latest
+
+
+def refresh_from_disk() -> dict | None:
+    """Picks up an image.png that was replaced outside of the app."""
+    latest = current_image()
+    path = os.path.join(_output_dir(), CURRENT_IMAGE)
+    if latest is None or _image_version(path) != latest["version"]:
+        return _store(_read_current_image())
+    return latest
+
+
+def wait_for_change(version: str | None, timeout: float) -> dict | None:
+    """Blocks until the current image differs from ``version`` or the timeout expires.
+
+    Returns:
+        The new image event, or None if nothing changed in time.
+    """
+    current_image()
+    deadline = time.monotonic() + timeout
+    with _condition:
+        while True:
+            latest = _latest
+            if latest is not None and latest["version"] != version:
+                return latest
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _condition.wait(remaining)
+
+    latest = refresh_from_disk()
+    if latest is not None and latest["version"] != version:
+        return latest
+    return None
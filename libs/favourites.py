@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import threading
+
+from libs import generic
+
+logger = logging.getLogger(__name__)
+
+COMPACT_THRESHOLD = 200
+
+# Per favourites file: the favourites as an insertion-ordered dict (used as
+# a set) and the stat stamp of the file and its journal they were read at.
+_cache: dict[str, dict] = {}
+_cache_lock = threading.Lock()
+
+
+def _path(path: str | None) -> str:
+    return path or generic.favourites_file
+
+
+def _journal_path(path: str) -> str:
+    return path + ".journal"
+
+
+def _stamp(path: str) -> tuple:
+    stamp = []
+    for p in (path, _journal_path(path)):
+        try:
+            st = os.stat(p)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def _lock(path: str, shared: bool = False):
+    return generic._acquire_lock(generic._file_lock_path(path), shared=shared)
+
+
+def _read(path: str) -> tuple[dict, int]:
+    """Reads the compacted list and replays the journal over it. Caller holds the file lock."""
+    items: dict[str, None] = {}
+    try:
+        with open(path) as f:
+            items = dict.fromkeys(json.load(f))
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        logger.error("Cannot parse %s: %s", path, e)
+
+    entries = 0
+    try:
+        with open(_journal_path(path)) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a write cut short by a crash
+                entries += 1
+                if entry.get("op") == "add":
+                    items[entry["file"]] = None
+                elif entry.get("op") == "remove":
+                    items.pop(entry["file"], None)
+    except FileNotFoundError:
+        pass
+    return items, entries
+
+
+def _load(path: str) -> dict:
+    """Returns the cache entry for a file, re-reading it only when it changed on disk."""
+    stamp = _stamp(path)
+    state = _cache.get(path)
+    if state is not None and state["stamp"] == stamp:
+        return state
+
+    lock_fd = _lock(path, shared=True)
+    try:
+        stamp = _stamp(path)
+        items, entries = _read(path)
+    finally:
+        generic._release_lock(lock_fd)
+    state = {"stamp": stamp, "items": items, "journal_entries": entries}
+    with _cache_lock:
+        _cache[path] = state
+    return state
+
+
+def get_all(path: str | None = None) -> list[str]:
+    """All favourites, oldest first. Served from memory until the files change."""
+    return list(_load(_path(path))["items"])
+
+
+def is_favourite(filename: str, path: str | None = None) -> bool:
+    return filename in _load(_path(path))["items"]
+
+
+def _write_compacted(path: str, items: dict) -> None:
+    """Rewrites the full list and empties the journal. Caller holds the exclusive lock."""
+    generic._atomic_write(path, json.dumps(list(items)))
+    try:
+        os.remove(_journal_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def _apply(path: str, changes: list[tuple[str, bool]], toggle: bool = False) -> dict[str, bool]:
+    lock_fd = _lock(path)
+    try:
+        items, entries = _read(path)
+        results, lines = {}, []
+        for filename, favourited in changes:
+            if toggle:
+                favourited = filename not in items
+            results[filename] = favourited
+            if favourited and filename not in items:
+                items[filename] = None
+                lines.append(json.dumps({"op": "add", "file": filename}))
+            elif not favourited and filename in items:
+                del items[filename]
+                lines.append(json.dumps({"op": "remove", "file": filename}))
+
+        if entries + len(lines) > COMPACT_THRESHOLD:
+            _write_compacted(path, items)
+            entries = 0
+        elif lines:
+            with open(_journal_path(path), "a") as f:
+                f.write("\n".join(lines) + "\n")
+            entries += len(lines)
+
+        state = {"stamp": _stamp(path), "items": items, "journal_entries": entries}
+        with _cache_lock:
+            _cache[path] = state
+    finally:
+        generic._release_lock(lock_fd)
+    return results
+
+
+def set_many(changes: dict[str, bool], path: str | None = None) -> dict[str, bool]:
+    """Adds or removes several favourites in one journal append."""
+    return _apply(_path(path), list(changes.items()))
+
+
+def toggle_many(filenames: list[str], path: str | None = None) -> dict[str, bool]:
+    """Flips each file's favourite state; returns the new states."""
+    return _apply(_path(path), [(f, False) for f in dict.fromkeys(filenames)], toggle=True)
+
+
+def toggle(filename: str, path: str | None = None) -> bool:
+    return toggle_many([filename], path)[filename]
+
+
+def rename(old_filename: str, new_filename: str, path: str | None = None) -> None:
+    """Carries a favourite over to a file's new name, keeping its position in the list."""
+    path = _path(path)
+    if old_filename not in _load(path)["items"]:
+        return
+    lock_fd = _lock(path)
+    try:
+        items, _ = _read(path)
+        if old_filename in items:
+            items = {(new_filename if f == old_filename else f): None for f in items}
+            _write_compacted(path, items)
+            with _cache_lock:
+                _cache[path] = {"stamp": _stamp(path), "items": items, "journal_entries": 0}
+    finally:
+        generic._release_lock(lock_fd)
+
+
+def replace_all(filenames: list[str], path: str | None = None) -> None:
+    path = _path(path)
+    items = dict.fromkeys(filenames)
+    lock_fd = _lock(path)
+    try:
+        _write_compacted(path, items)
+        with _cache_lock:
+            _cache[path] = {"stamp": _stamp(path), "items": items, "journal_entries": 0}
+    finally:
+        generic._release_lock(lock_fd)
+
+
+def compact(path: str | None = None) -> None:
+    """Folds the journal into favourites.json, e.g. before handing the file out."""
+    path = _path(path)
+    if not os.path.exists(_journal_path(path)):
+        return
+    lock_fd = _lock(path)
+    try:
+        items, _ = _read(path)
+        _write_compacted(path, items)
+        with _cache_lock:
+            _cache[path] = {"stamp": _stamp(path), "items": items, "journal_entries": 0}
+    finally:
+        generic._release_lock(lock_fd)
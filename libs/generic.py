@@ -2,7 +2,6 @@ import configparser
 import fcntl
 import hashlib
 import hmac
-import json
 import logging
 import os
 import random
@@ -13,12 +12,10 @@ import sys
 import threading
 import time
 import uuid
-from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime
 
-from PIL import Image
-
-from libs.create_thumbnail import generate_thumbnail
+from libs.create_thumbnail import generate_thumbnail, rename_thumbnails, rename_display_rendition
 
 logger = logging.getLogger(__name__)
 
@@ -31,17 +28,95 @@ SYSTEM_PROMPT = (
     "Keep the prompt concise, no extra commentary or formatting."
 )
 
-_png_details_cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
-_png_cache_lock = threading.Lock()
-_PNG_CACHE_MAX = 256
-_PNG_CACHE_TTL = 30.0
+CONFIG_WATCH_INTERVAL = 2.0
+
+
+def _split_list(value: str) -> tuple[str, ...]:
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """An immutable, pre-parsed view of user_config.cfg.
+
+    Built once per (re)load, so hot paths read typed fields and ready-split
+    lists instead of re-parsing the raw strings on every call.
+    """
+    generation: int
+    comfyui_urls: tuple[str, ...]
+    output_dir: str
+    base_prompt: str
+    width: str
+    height: str
+    sdxl_models: tuple[str, ...]
+    flux_models: tuple[str, ...]
+    qwen_models: tuple[str, ...]
+    use_flux: bool
+    only_flux: bool
+    use_qwen: bool
+    topics: tuple[str, ...]
+    secondary_topic: str
+    openwebui_models: tuple[str, ...]
+    openrouter_enabled: bool
+    openrouter_models: tuple[str, ...]
+    openrouter_list_all_free_models: bool
+    ollama_enabled: bool
+    ollama_models: tuple[str, ...]
+    ollama_list_all_cloud_models: bool
+
+    @classmethod
+    def from_config(cls, config: configparser.ConfigParser, generation: int) -> "ConfigSnapshot":
+        def text(section, key, default=""):
+            return config.get(section, key, fallback=default)
+
+        return cls(
+            generation=generation,
+            comfyui_urls=tuple(url.rstrip("/") for url in _split_list(text("comfyui", "comfyui_url"))),
+            output_dir=text("comfyui", "output_dir", "./output/"),
+            base_prompt=text("comfyui", "prompt", "Generate a random detailed prompt for stable diffusion."),
+            width=text("comfyui", "width"),
+            height=text("comfyui", "height"),
+            sdxl_models=_split_list(text("comfyui", "models")),
+            flux_models=_split_list(text("comfyui:flux", "models")),
+            qwen_models=_split_list(text("comfyui:qwen", "models")),
+            use_flux=get_bool(config, "comfyui", "flux", False),
+            only_flux=get_bool(config, "comfyui", "only_flux", False),
+            use_qwen=get_bool(config, "comfyui", "qwen", False),
+            topics=_split_list(text("comfyui", "topics")),
+            secondary_topic=text("comfyui", "secondary_topic").strip(),
+            openwebui_models=_split_list(text("openwebui", "models")),
+            openrouter_enabled=get_bool(config, "openrouter", "enabled", False),
+            openrouter_models=_split_list(text("openrouter", "models")),
+            openrouter_list_all_free_models=get_bool(config, "openrouter", "list_all_free_models", False),
+            ollama_enabled=get_bool(config, "ollama", "enabled", False),
+            ollama_models=_split_list(text("ollama", "models")),
+            ollama_list_all_cloud_models=get_bool(config, "ollama", "list_all_cloud_models", False),
+        )
 
 
 class ConfigSingleton:
     _config = None
+    _snapshot: ConfigSnapshot | None = None
     _mtime = 0.0
     _path = "./user_config.cfg"
     _lock = threading.Lock()
+    _generation = 0
+    _watcher: threading.Thread | None = None
+
+    @classmethod
+    def current(cls) -> configparser.ConfigParser | None:
+        """The loaded config, without a stat or a lock, while the watcher keeps it fresh."""
+        if cls._watcher is not None:
+            return cls._config
+        return None
+
+    @classmethod
+    def _swap(cls, cfg: configparser.ConfigParser, mtime: float) -> None:
+        """Publishes a newly read config. Caller holds _lock."""
+        cls._generation += 1
+        cls._snapshot = ConfigSnapshot.from_config(cfg, cls._generation)
+        cls._config = cfg
+        cls._mtime = mtime
 
     @classmethod
     def get(cls) -> configparser.ConfigParser:
@@ -56,12 +131,10 @@ class ConfigSingleton:
                 cfg = configparser.ConfigParser()
                 read_files = cfg.read(config_path)
                 if read_files:
-                    cls._config = cfg
-                    cls._mtime = current_mtime
+                    cls._swap(cfg, current_mtime)
                     logger.debug("Configuration loaded/reloaded from %s", config_path)
                 elif cls._config is None:
-                    cls._config = cfg
-                    cls._mtime = current_mtime
+                    cls._swap(cfg, current_mtime)
                     logger.warning("Configuration file %s could not be read", config_path)
             return cls._config
 
@@ -70,8 +143,50 @@ class ConfigSingleton:
         cls._config = None
         cls._mtime = 0.0
 
+    @classmethod
+    def reload(cls) -> configparser.ConfigParser:
+        """Re-reads the file now, e.g. right after the settings page saved it."""
+        with cls._lock:
+            cls._mtime = 0.0
+        return cls.get()
+
+    @classmethod
+    def snapshot(cls) -> ConfigSnapshot:
+        snapshot = cls._snapshot
+        if snapshot is None or cls._watcher is None:
+            load_config()
+            snapshot = cls._snapshot
+        return snapshot
+
+    @classmethod
+    def generation(cls) -> int:
+        """Incremented every time the configuration is (re)loaded."""
+        return cls._generation
+
+    @classmethod
+    def _watch(cls, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                cls.get()
+            except Exception as e:
+                logger.warning("Config watcher failed to reload %s: %s", cls._path, e)
+
+    @classmethod
+    def start_watcher(cls, interval: float = CONFIG_WATCH_INTERVAL) -> None:
+        """Polls the config file in the background so readers can skip their own checks (once per process)."""
+        if cls._watcher is not None:
+            return
+        load_config()
+        cls._watcher = threading.Thread(target=cls._watch, args=(interval,), name="config-watcher", daemon=True)
+        cls._watcher.start()
+
 
 def load_config() -> configparser.ConfigParser:
+    config = ConfigSingleton.current()
+    if config is not None:
+        return config
+
     sample_path = "./user_config.cfg.sample"
 
     if not os.path.exists(ConfigSingleton._path):
@@ -85,6 +200,11 @@ def load_config() -> configparser.ConfigParser:
     return ConfigSingleton.get()
 
 
+def get_config_snapshot() -> ConfigSnapshot:
+    """The current pre-parsed config; lock-free while the config watcher runs."""
+    return ConfigSingleton.snapshot()
+
+
 def get_bool(config: configparser.ConfigParser, section: str, key: str, default: bool = False) -> bool:
     value = config.get(section, key, fallback=str(default)).lower()
     return value in ("true", "1", "yes", "on")
@@ -100,6 +220,29 @@ def extract_prompt(text: str) -> str:
     return text.strip()
 
 
+_LIST_MARKER_RE = re.compile(r"^\s*(?:\d+[.):]|[-*\u2022])\s*")
+
+
+def batch_instruction(count: int) -> str:
+    return (
+        f"\n\nGive me {count} different, unrelated ideas instead of one. "
+        "Put each on its own line, numbered, with no other text."
+    )
+
+
+def extract_prompts(text: str) -> list[str]:
+    """Splits a numbered or bulleted list of prompts from an LLM reply."""
+    prompts = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or (line.endswith(":") and not _LIST_MARKER_RE.match(line)):
+            continue
+        prompt = _LIST_MARKER_RE.sub("", line, count=1).strip().strip('"').strip()
+        if prompt and prompt not in prompts:
+            prompts.append(prompt)
+    return prompts
+
+
 def _read_last_lines(filepath: str, count: int) -> list[str]:
     lines: list[str] = []
     try:
@@ -125,35 +268,18 @@ def _read_last_lines(filepath: str, count: int) -> list[str]:
 
 
 def load_recent_prompts(count=20):
-    recent_prompts = []
-    lines = _read_last_lines(LOG_FILE, count)
-    for line in lines:
-        try:
-            data = json.loads(line.strip())
-            recent_prompts.append(data["prompt"])
-        except (json.JSONDecodeError, KeyError):
-            continue
-    return recent_prompts
+    from libs import prompt_history
+    return prompt_history.recent_prompts(count)
 
 
 def load_recent_topics(count=5):
-    recent_topics = []
-    lines = _read_last_lines(LOG_FILE, count)
-    for line in lines:
-        try:
-            data = json.loads(line.strip())
-            topic = data.get("topic", "")
-            if topic:
-                recent_topics.append(topic)
-        except (json.JSONDecodeError, KeyError):
-            continue
-    return recent_topics
+    from libs import prompt_history
+    return prompt_history.recent_topics(count)
 
 
-def save_prompt(prompt, topic=""):
-    entry = {"date": datetime.now().strftime("%Y-%m-%d"), "prompt": prompt, "topic": topic}
-    with open(LOG_FILE, "a") as f:
-        f.write(json.dumps(entry) + "\n")
+def save_prompt(prompt, topic="", model=""):
+    from libs import prompt_history
+    prompt_history.record(prompt, topic, model)
 
 
 def hash_password(password: str) -> str:
@@ -169,10 +295,10 @@ def _file_lock_path(filepath: str) -> str:
     return filepath + ".lock"
 
 
-def _acquire_lock(lock_path: str):
+def _acquire_lock(lock_path: str, shared: bool = False):
     lock_fd = open(lock_path, "w")
     try:
-        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        fcntl.flock(lock_fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
     except Exception:
         lock_fd.close()
         raise
@@ -186,6 +312,13 @@ def _release_lock(lock_fd):
         lock_fd.close()
 
 
+def new_image_filename() -> str:
+    """Returns a unique, timestamped gallery filename."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    short_uuid = uuid.uuid4().hex[:6]
+    return f"{timestamp}_{short_uuid}.png"
+
+
 def rename_image(config=None, fav_file=None) -> str | None:
     cfg = load_config() if config is None else config
     fav_path = fav_file or favourites_file
@@ -196,40 +329,25 @@ def rename_image(config=None, fav_file=None) -> str | None:
         logger.info("No image.png found.")
         return None
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    short_uuid = uuid.uuid4().hex[:6]
-    new_filename = f"{timestamp}_{short_uuid}.png"
+    new_filename = new_image_filename()
     new_path = os.path.join(output_dir, new_filename)
 
-    lock_fd = None
-    try:
-        lock_fd = _acquire_lock(_file_lock_path(fav_path))
-        if os.path.exists(fav_path):
-            with open(fav_path, 'r') as f:
-                favourites = json.load(f)
-            if "image.png" in favourites:
-                favourites.remove("image.png")
-                favourites.append(new_filename)
-                _atomic_write(fav_path, json.dumps(favourites))
-
-        os.rename(old_path, new_path)
-        generate_thumbnail(new_path)
-        logger.info("Renamed 'image.png' to '%s'", new_filename)
-        return new_filename
-    finally:
-        if lock_fd is not None:
-            _release_lock(lock_fd)
+    from libs import favourites
+    favourites.rename("image.png", new_filename, fav_path)
+
+    os.rename(old_path, new_path)
+    from libs.catalog import rename_entry
+    rename_entry("image.png", new_filename, output_dir)
+    rename_thumbnails(old_path, new_path)
+    rename_display_rendition(old_path, new_path)
+    generate_thumbnail(new_path)
+    logger.info("Renamed 'image.png' to '%s'", new_filename)
+    return new_filename
 
 
 def get_favourites() -> list[str]:
-    if not os.path.exists(favourites_file):
-        return []
-    lock_fd = _acquire_lock(_file_lock_path(favourites_file))
-    try:
-        with open(favourites_file, 'r') as f:
-            return json.load(f)
-    finally:
-        _release_lock(lock_fd)
+    from libs import favourites
+    return favourites.get_all()
 
 
 def _atomic_write(filepath: str, data: str) -> None:
@@ -256,11 +374,8 @@ def _atomic_write(filepath: str, data: str) -> None:
 
 
 def save_favourites(favourites: list[str]) -> None:
-    lock_fd = _acquire_lock(_file_lock_path(favourites_file))
-    try:
-        _atomic_write(favourites_file, json.dumps(favourites))
-    finally:
-        _release_lock(lock_fd)
+    from libs import favourites as store
+    store.replace_all(favourites)
 
 
 def _find_model_from_metadata(data: dict) -> str:
@@ -275,61 +390,64 @@ def _find_model_from_metadata(data: dict) -> str:
     return "unknown"
 
 
+def parse_workflow_details(data: dict) -> tuple[str, str]:
+    prompt = ""
+    for node in data.values():
+        if not isinstance(node, dict):
+            continue
+        class_type = node.get("class_type", "")
+        inputs = node.get("inputs", {})
+        text_val = inputs.get("text", "")
+        if isinstance(text_val, list):
+            continue
+        if class_type in ("ttN text",) or "text" in class_type.lower():
+            meta = node.get("_meta", {})
+            title = meta.get("title", "").lower()
+            if "positive" in title or "prompt" in title:
+                prompt = text_val
+                break
+        if "CLIPTextEncode" in class_type:
+            meta = node.get("_meta", {})
+            title = meta.get("title", "").lower()
+            if "positive" in title or "prompt" in title:
+                if isinstance(text_val, str):
+                    prompt = text_val
+                    break
+    if not prompt:
+        for key_node in data:
+            if isinstance(data[key_node], dict):
+                text_val = data[key_node].get("inputs", {}).get("text", "")
+                if isinstance(text_val, str) and text_val:
+                    prompt = text_val
+                    break
+    return prompt, _find_model_from_metadata(data)
+
+
 def get_details_from_png(path):
+    from libs.catalog import get_details
     try:
-        mtime = os.path.getmtime(path)
-        with _png_cache_lock:
-            if path in _png_details_cache:
-                cached_mtime, cached_data = _png_details_cache[path]
-                if mtime <= cached_mtime:
-                    return cached_data
-
-        date = datetime.fromtimestamp(os.path.getctime(path)).strftime("%d-%m-%Y")
-        with Image.open(path) as img:
-            data = json.loads(img.info["prompt"])
-            prompt = ""
-            for node in data.values():
-                if not isinstance(node, dict):
-                    continue
-                class_type = node.get("class_type", "")
-                inputs = node.get("inputs", {})
-                text_val = inputs.get("text", "")
-                if isinstance(text_val, list):
-                    continue
-                if class_type in ("ttN text",) or "text" in class_type.lower():
-                    meta = node.get("_meta", {})
-                    title = meta.get("title", "").lower()
-                    if "positive" in title or "prompt" in title:
-                        prompt = text_val
-                        break
-                if "CLIPTextEncode" in class_type:
-                    meta = node.get("_meta", {})
-                    title = meta.get("title", "").lower()
-                    if "positive" in title or "prompt" in title:
-                        if isinstance(text_val, str):
-                            prompt = text_val
-                            break
-            if not prompt:
-                for key_node in data:
-                    if isinstance(data[key_node], dict):
-                        text_val = data[key_node].get("inputs", {}).get("text", "")
-                        if isinstance(text_val, str) and text_val:
-                            prompt = text_val
-                            break
-            model = _find_model_from_metadata(data)
-            result = {"p": prompt, "m": model, "d": date}
-
-        with _png_cache_lock:
-            _png_details_cache[path] = (mtime, result)
-            if len(_png_details_cache) > _PNG_CACHE_MAX:
-                _png_details_cache.popitem(last=False)
-        return result
+        return get_details(path)
     except Exception as e:
         logger.warning("Error reading metadata from %s: %s", path, e)
         return {"p": "", "m": "", "d": ""}
 
 
-def get_current_version():
+BUMPVERSION_FILE = "./.bumpversion.toml"
+
+_build_info: dict | None = None
+_build_info_lock = threading.Lock()
+
+
+def _resolve_version() -> str:
+    version = os.environ.get("APP_VERSION", "").strip()
+    if version:
+        return version
+    try:
+        import tomllib
+        with open(BUMPVERSION_FILE, "rb") as f:
+            return tomllib.load(f)["tool"]["bumpversion"]["current_version"]
+    except (OSError, ValueError, KeyError) as e:
+        logger.debug("Cannot read version from %s: %s", BUMPVERSION_FILE, e)
     try:
         result = subprocess.run(
             ['bump-my-version', 'show', 'current_version'],
@@ -338,50 +456,56 @@ def get_current_version():
             text=True,
             check=True
         )
-        version = result.stdout.strip()
-        return version
-    except subprocess.CalledProcessError as e:
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError) as e:
         logger.error("Error running bump-my-version: %s", e)
         return "unknown"
 
 
-def load_models_from_config():
-    config = load_config()
+def get_build_info() -> dict:
+    """Version and build metadata, resolved once per process.
 
-    use_flux = get_bool(config, "comfyui", "flux", False)
-    if use_flux and "comfyui:flux" in config and "models" in config["comfyui:flux"]:
-        flux_models = [m.strip() for m in config["comfyui:flux"]["models"].split(",") if m.strip()]
-    else:
-        flux_models = []
+    The Docker image bakes APP_VERSION, GIT_COMMIT and BUILD_DATE in at
+    build time; a checkout reads the version from .bumpversion.toml.
+    """
+    global _build_info
+    with _build_info_lock:
+        if _build_info is None:
+            _build_info = {
+                "version": _resolve_version(),
+                "commit": os.environ.get("GIT_COMMIT", "").strip() or None,
+                "build_date": os.environ.get("BUILD_DATE", "").strip() or None,
+                "python": sys.version.split()[0],
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+            }
+        return _build_info
 
-    sdxl_models = [m.strip() for m in config["comfyui"]["models"].split(",") if m.strip()]
 
-    use_qwen = get_bool(config, "comfyui", "qwen", False)
-    if use_qwen and "comfyui:qwen" in config and "models" in config["comfyui:qwen"]:
-        qwen_models = [m.strip() for m in config["comfyui:qwen"]["models"].split(",") if m.strip()]
-    else:
-        qwen_models = []
+def get_current_version():
+    return get_build_info()["version"]
+
 
+def load_models_from_config():
+    snapshot = get_config_snapshot()
+    flux_models = snapshot.flux_models if snapshot.use_flux else ()
+    qwen_models = snapshot.qwen_models if snapshot.use_qwen else ()
     return (
-        sorted(sdxl_models, key=str.lower),
+        sorted(snapshot.sdxl_models, key=str.lower),
         sorted(flux_models, key=str.lower),
         sorted(qwen_models, key=str.lower),
     )
 
 
 def load_topics_from_config():
-    config = load_config()
-    topics = [t.strip() for t in config["comfyui"]["topics"].split(",") if t.strip()]
-    return sorted(topics, key=str.lower)
+    return sorted(get_config_snapshot().topics, key=str.lower)
 
 
 def load_openrouter_models_from_config():
-    config = load_config()
-    if get_bool(config, "openrouter", "enabled", False):
-        models = config["openrouter"]["models"].split(",")
-        configured_models = sorted([model.strip() for model in models if model.strip()], key=str.lower)
+    snapshot = get_config_snapshot()
+    if snapshot.openrouter_enabled:
+        configured_models = sorted(snapshot.openrouter_models, key=str.lower)
         free_models = []
-        if get_bool(config, "openrouter", "list_all_free_models", False):
+        if snapshot.openrouter_list_all_free_models:
             from libs.openrouter import get_free_models
             free_models = get_free_models()
         return configured_models, free_models
@@ -389,20 +513,15 @@ def load_openrouter_models_from_config():
 
 
 def load_openwebui_models_from_config():
-    config = load_config()
-    if "openwebui" in config and "models" in config["openwebui"]:
-        models = config["openwebui"]["models"].split(",")
-        return sorted([model.strip() for model in models if model.strip()], key=str.lower)
-    return []
+    return sorted(get_config_snapshot().openwebui_models, key=str.lower)
 
 
 def load_ollama_models_from_config():
-    config = load_config()
-    if get_bool(config, "ollama", "enabled", False) and "models" in config["ollama"]:
-        models = config["ollama"]["models"].split(",")
-        configured_models = sorted([model.strip() for model in models if model.strip()], key=str.lower)
+    snapshot = get_config_snapshot()
+    if snapshot.ollama_enabled:
+        configured_models = sorted(snapshot.ollama_models, key=str.lower)
         cloud_models = []
-        if get_bool(config, "ollama", "list_all_cloud_models", False):
+        if snapshot.ollama_list_all_cloud_models:
             from libs.ollama import get_cloud_models
             cloud_models = get_cloud_models()
         return configured_models, cloud_models
@@ -410,34 +529,26 @@ def load_ollama_models_from_config():
 
 
 def load_prompt_models_from_config():
-    config = load_config()
-    prompt_models = []
+    snapshot = get_config_snapshot()
+    prompt_models = [("openwebui", model) for model in snapshot.openwebui_models]
 
-    if "openwebui" in config and "models" in config["openwebui"]:
-        openwebui_models = config["openwebui"]["models"].split(",")
-        prompt_models.extend([("openwebui", model.strip()) for model in openwebui_models if model.strip()])
-
-    if get_bool(config, "openrouter", "enabled", False) and "models" in config["openrouter"]:
-        openrouter_models = config["openrouter"]["models"].split(",")
-        prompt_models.extend([("openrouter", model.strip()) for model in openrouter_models if model.strip()])
-        if get_bool(config, "openrouter", "list_all_free_models", False):
+    if snapshot.openrouter_enabled:
+        prompt_models.extend(("openrouter", model) for model in snapshot.openrouter_models)
+        if snapshot.openrouter_list_all_free_models:
             from libs.openrouter import get_free_models
-            free_models = get_free_models()
-            prompt_models.extend([("openrouter", model) for model in free_models])
+            prompt_models.extend(("openrouter", model) for model in get_free_models())
 
-    if get_bool(config, "ollama", "enabled", False) and "models" in config["ollama"]:
-        ollama_models = config["ollama"]["models"].split(",")
-        prompt_models.extend([("ollama", model.strip()) for model in ollama_models if model.strip()])
-        if get_bool(config, "ollama", "list_all_cloud_models", False):
+    if snapshot.ollama_enabled:
+        prompt_models.extend(("ollama", model) for model in snapshot.ollama_models)
+        if snapshot.ollama_list_all_cloud_models:
             from libs.ollama import get_cloud_models
-            cloud_models = get_cloud_models()
-            prompt_models.extend([("ollama", model) for model in cloud_models])
+            prompt_models.extend(("ollama", model) for model in get_cloud_models())
 
     return prompt_models
 
 
 def build_user_content(topic: str = "random", recent_prompts: list[str] | None = None) -> tuple[str, str]:
-    config = load_config()
+    snapshot = get_config_snapshot()
     topic_instruction = ""
     selected_topic = ""
     secondary_topic_instruction = ""
@@ -445,8 +556,8 @@ def build_user_content(topic: str = "random", recent_prompts: list[str] | None =
         recent_prompts = list(set(load_recent_prompts()))
     recent_topics = load_recent_topics()
 
+    topics = snapshot.topics
     if topic == "random":
-        topics = [t.strip() for t in config["comfyui"]["topics"].split(",") if t.strip()]
         available_topics = [t for t in topics if t not in recent_topics]
         if available_topics:
             selected_topic = random.choice(available_topics)
@@ -455,7 +566,6 @@ def build_user_content(topic: str = "random", recent_prompts: list[str] | None =
     elif topic != "":
         selected_topic = topic
     else:
-        topics = [t.strip() for t in config["comfyui"]["topics"].split(",") if t.strip()]
         available_topics = [t for t in topics if t not in recent_topics]
         if random.random() < 0.3 and available_topics:
             selected_topic = random.choice(available_topics)
@@ -465,7 +575,7 @@ def build_user_content(topic: str = "random", recent_prompts: list[str] | None =
     if selected_topic != "":
         topic_instruction = f" Incorporate the theme of '{selected_topic}' into the new prompt."
 
-    secondary_topic = config["comfyui"].get("secondary_topic", "").strip()
+    secondary_topic = snapshot.secondary_topic
     if secondary_topic:
         secondary_topic_instruction = f" Additionally incorporate the theme of '{secondary_topic}' into the new prompt."
 
@@ -480,20 +590,20 @@ def build_user_content(topic: str = "random", recent_prompts: list[str] | None =
     return user_content, selected_topic
 
 
-def _call_prompt_service(service: str, model: str, full_prompt: str):
+def call_prompt_service(service: str, model: str, full_prompt: str, count: int = 1):
     if service == "openwebui":
         from libs.openwebui import create_prompt_on_openwebui
-        return create_prompt_on_openwebui(full_prompt, "", model)
+        return create_prompt_on_openwebui(full_prompt, "", model, count=count)
     elif service == "openrouter":
         from libs.openrouter import create_prompt_on_openrouter
-        return create_prompt_on_openrouter(full_prompt, "", model)
+        return create_prompt_on_openrouter(full_prompt, "", model, count=count)
     elif service == "ollama":
         from libs.ollama import create_prompt_on_ollama
-        return create_prompt_on_ollama(full_prompt, "", model)
+        return create_prompt_on_ollama(full_prompt, "", model, count=count)
     return None
 
 
-def _is_duplicate_prompt(prompt: str, recent_prompts: list[str]) -> bool:
+def is_duplicate_prompt(prompt: str, recent_prompts: list[str]) -> bool:
     normalized = prompt.strip().lower().rstrip("\n")
     for rp in recent_prompts:
         if normalized == rp.strip().lower().rstrip("\n"):
@@ -502,84 +612,10 @@ def _is_duplicate_prompt(prompt: str, recent_prompts: list[str]) -> bool:
 
 
 def create_prompt_with_random_model(base_prompt: str, topic: str = "random"):
-    prompt_models = load_prompt_models_from_config()
-
-    if not prompt_models:
-        logging.warning("No prompt generation models configured.")
-        return None, ""
-
+    """Generates a prompt with whichever configured model the router favours, hedging slow ones."""
+    from libs import prompt_router
     recent_prompts = list(set(load_recent_prompts()))
-    max_attempts = 3
-
-    service, model = random.choice(prompt_models)
-
-    def _fallback_to_other_services(excluded_service, topic, base_prompt):
-        other_models = [m for m in prompt_models if m[0] != excluded_service]
-        if other_models:
-            fb_service, fb_model = random.choice(other_models)
-            user_content, selected_topic = build_user_content(topic, recent_prompts)
-            full_prompt = base_prompt + "\n\n" + user_content
-            result = _call_prompt_service(fb_service, fb_model, full_prompt)
-            if result is not None:
-                return result, selected_topic
-        logging.error("No fallback models available (excluded: %s).", excluded_service)
-        return "A colorful abstract composition", ""
-
-    def _generate_once():
-        nonlocal service, model
-        service, model = random.choice(prompt_models)
-
-        if service == "openwebui":
-            try:
-                logging.info("Attempting to generate prompt with OpenWebUI using model: %s", model)
-                user_content, selected_topic = build_user_content(topic, recent_prompts)
-                full_prompt = base_prompt + "\n\n" + user_content
-                result = _call_prompt_service("openwebui", model, full_prompt)
-                if result:
-                    return result, selected_topic
-
-                logging.warning("First OpenWebUI attempt failed. Retrying...")
-                result = _call_prompt_service("openwebui", model, full_prompt)
-                if result:
-                    return result, selected_topic
-
-                logging.warning("Second OpenWebUI attempt failed. Falling back to other services...")
-                return _fallback_to_other_services("openwebui", topic, base_prompt)
-
-            except Exception as e:
-                logging.error("Error with OpenWebUI: %s", e)
-                logging.warning("OpenWebUI exception. Falling back to other services...")
-                return _fallback_to_other_services("openwebui", topic, base_prompt)
-
-        elif service == "openrouter":
-            try:
-                user_content, selected_topic = build_user_content(topic, recent_prompts)
-                full_prompt = base_prompt + "\n\n" + user_content
-                return create_prompt_on_openrouter(full_prompt, "", model), selected_topic
-            except Exception as e:
-                logging.error("Error with OpenRouter: %s", e)
-                return _fallback_to_other_services("openrouter", topic, base_prompt)
-
-        elif service == "ollama":
-            try:
-                user_content, selected_topic = build_user_content(topic, recent_prompts)
-                full_prompt = base_prompt + "\n\n" + user_content
-                return create_prompt_on_ollama(full_prompt, "", model), selected_topic
-            except Exception as e:
-                logging.error("Error with Ollama: %s", e)
-                return _fallback_to_other_services("ollama", topic, base_prompt)
-
-        return None, ""
-
-    for attempt in range(max_attempts):
-        result, selected_topic = _generate_once()
-        if result and not _is_duplicate_prompt(result, recent_prompts):
-            return result, selected_topic
-        if attempt < max_attempts - 1:
-            logging.warning("Generated duplicate prompt (attempt %d/%d), retrying...", attempt + 1, max_attempts)
-
-    logging.warning("All %d attempts produced duplicate prompts.", max_attempts)
-    return None, ""
+    return prompt_router.generate(base_prompt, topic, recent_prompts)
 
 
 user_config = load_config()
@@ -0,0 +1,332 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+from libs.generic import load_config, get_config_snapshot, create_prompt_with_random_model, save_prompt
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB = "./jobs.db"
+
+QUEUED = "queued"
+PROMPTING = "prompting"
+RENDERING = "rendering"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, PROMPTING, RENDERING)
+
+MAX_ATTEMPTS = 3
+MAX_BATCH = 16
+RETRY_DELAY = 5.0
+DEFAULT_CONCURRENCY = 2
+DEFAULT_BACKEND = "default"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    prompt TEXT NOT NULL DEFAULT '',
+    prompt_model TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT 'Random Image Model',
+    topic TEXT NOT NULL DEFAULT '',
+    backend TEXT NOT NULL DEFAULT '',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    progress REAL NOT NULL DEFAULT 0,
+    error TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    not_before REAL NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 1,
+    prompts TEXT NOT NULL DEFAULT '',
+    done_items TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+_MIGRATIONS = {
+    "count": "ALTER TABLE jobs ADD COLUMN count INTEGER NOT NULL DEFAULT 1",
+    "prompts": "ALTER TABLE jobs ADD COLUMN prompts TEXT NOT NULL DEFAULT ''",
+    "done_items": "ALTER TABLE jobs ADD COLUMN done_items TEXT NOT NULL DEFAULT ''",
+}
+
+_conn: sqlite3.Connection | None = None
+_db_lock = threading.Lock()
+_wakeup = threading.Condition()
+_workers: list[threading.Thread] = []
+
+
+def _get_connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(JOBS_DB, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in _conn.execute("PRAGMA table_info(jobs)")}
+        for column, statement in _MIGRATIONS.items():
+            if column not in columns:
+                _conn.execute(statement)
+        _conn.commit()
+    return _conn
+
+
+def _row_to_job(row) -> dict:
+    return {key: row[key] for key in row.keys()}
+
+
+def _update(job_id: str, **fields) -> None:
+    fields["updated"] = time.time()
+    assignments = ", ".join(f"{key} = :{key}" for key in fields)
+    with _db_lock:
+        conn = _get_connection()
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = :id", dict(fields, id=job_id))
+        conn.commit()
+
+
+def submit_job(prompt: str = "", model: str = "Random Image Model", topic: str = "", prompt_model: str = "",
+               count: int = 1) -> str:
+    """Persists a new generation job and wakes a worker. Returns the job ID immediately.
+
+    A ``count`` above one makes a batch job: that many images rendered in one
+    pipelined submission, each from its own generated prompt (or variations
+    of ``prompt`` if one is given).
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    count = max(1, min(int(count), MAX_BATCH))
+    with _db_lock:
+        conn = _get_connection()
+        conn.execute(
+            "INSERT INTO jobs (id, status, prompt, prompt_model, model, topic, count, created, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, prompt or "", prompt_model or "", model, topic or "", count, now, now),
+        )
+        conn.commit()
+    with _wakeup:
+        _wakeup.notify()
+    logger.info("Queued job %s", job_id)
+    return job_id
+
+
+def get_job(job_id: str) -> dict | None:
+    with _db_lock:
+        row = _get_connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def list_jobs(limit: int = 50, active_only: bool = False) -> list[dict]:
+    query = "SELECT * FROM jobs"
+    if active_only:
+        query += f" WHERE status IN ({','.join('?' * len(ACTIVE_STATUSES))})"
+    query += " ORDER BY created DESC LIMIT ?"
+    params = (*ACTIVE_STATUSES, limit) if active_only else (limit,)
+    with _db_lock:
+        rows = _get_connection().execute(query, params).fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+def has_active_jobs() -> bool:
+    with _db_lock:
+        row = _get_connection().execute(
+            f"SELECT 1 FROM jobs WHERE status IN ({','.join('?' * len(ACTIVE_STATUSES))}) LIMIT 1", ACTIVE_STATUSES
+        ).fetchone()
+    return row is not None
+
+
+def set_progress(job_id: str, progress: float) -> None:
+    _update(job_id, progress=max(0.0, min(1.0, progress)))
+
+
+def _claim_next(backend: str) -> dict | None:
+    now = time.time()
+    with _db_lock:
+        conn = _get_connection()
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = ? AND not_before <= ? ORDER BY created LIMIT 1",
+            (QUEUED, now),
+        ).fetchone()
+        if row is None:
+            return None
+        status = RENDERING if row["prompt"] else PROMPTING
+        conn.execute(
+            "UPDATE jobs SET status = ?, backend = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+            (status, backend, now, row["id"]),
+        )
+        conn.commit()
+    job = _row_to_job(row)
+    job.update(status=status, backend=backend, attempts=row["attempts"] + 1)
+    return job
+
+
+def _next_wakeup() -> float | None:
+    with _db_lock:
+        row = _get_connection().execute(
+            "SELECT MIN(not_before) AS due FROM jobs WHERE status = ?", (QUEUED,)
+        ).fetchone()
+    return row["due"] if row and row["due"] is not None else None
+
+
+def generate_prompt(prompt_model: str, topic: str) -> tuple[str | None, str]:
+    base_prompt = get_config_snapshot().base_prompt
+    if not prompt_model or prompt_model == "Random Prompt Model":
+        from libs import prompt_buffer
+        buffered = prompt_buffer.take(topic)
+        if buffered is not None:
+            return buffered
+        return create_prompt_with_random_model(base_prompt, topic)
+
+    service, _, service_model = prompt_model.partition(":")
+    prompt = None
+    try:
+        if service == "openwebui":
+            from libs.openwebui import create_prompt_on_openwebui
+            prompt = create_prompt_on_openwebui(base_prompt, topic, service_model)
+        elif service == "openrouter":
+            from libs.openrouter import create_prompt_on_openrouter
+            prompt = create_prompt_on_openrouter(base_prompt, topic, service_model)
+        elif service == "ollama":
+            from libs.ollama import create_prompt_on_ollama
+            prompt = create_prompt_on_ollama(base_prompt, topic, service_model)
+    except Exception as e:
+        # e.g. rate limited: let the router pick a model that is answering.
+        logger.warning("Prompt model %s failed, using another: %s", prompt_model, e)
+        return create_prompt_with_random_model(base_prompt, topic)
+    return prompt, topic if topic and topic != "random" else ""
+
+
+def _run_job(job: dict) -> None:
+    """Renders a claimed job.
+
+    A job's prompts are stored (JSON in ``prompts``) and logged to the
+    prompt history before anything is rendered, together with the image
+    model picked for them. Each finished batch item's index is added to
+    ``done_items``, so a retry or a job requeued after a restart renders the
+    same prompts with the same model, only for the items still missing, and
+    logs nothing again.
+    """
+    from libs.comfyui import create_image, create_images, select_model
+
+    backend = job["backend"] if job["backend"] != DEFAULT_BACKEND else None
+    topic, model = job["topic"], job["model"]
+    prompts = json.loads(job["prompts"]) if job["prompts"] else []
+    if not prompts and job["prompt"]:
+        prompts = [job["prompt"]] * job["count"]
+    elif not prompts:
+        for _ in range(job["count"]):
+            generated, generated_topic = generate_prompt(job["prompt_model"], job["topic"])
+            if generated:
+                prompts.append(generated)
+                topic = generated_topic
+        if not prompts:
+            raise RuntimeError("Prompt generation returned nothing")
+    if not job["prompts"]:
+        _, model = select_model(model)
+        # A prompt given explicitly repeats for every image in the batch; log it once.
+        for prompt in dict.fromkeys(prompts):
+            save_prompt(prompt, topic, model)
+        _update(job["id"], prompt=prompts[0], prompts=json.dumps(prompts), topic=topic, model=model, status=RENDERING)
+
+    done = set(json.loads(job["done_items"])) if job["done_items"] else set()
+    remaining = [i for i in range(len(prompts)) if i not in done]
+    if not remaining:
+        return
+    if done:
+        logger.info("Job %s resuming with %d of %d image(s) left", job["id"], len(remaining), len(prompts))
+
+    last_reported = [0.0]
+
+    def on_progress(fraction: float) -> None:
+        # Sampler steps arrive many times a second; only persist visible changes.
+        if fraction - last_reported[0] >= 0.02 or fraction >= 1.0:
+            last_reported[0] = fraction
+            set_progress(job["id"], fraction)
+
+    def on_item_done(position: int) -> None:
+        done.add(remaining[position])
+        _update(job["id"], done_items=json.dumps(sorted(done)))
+
+    if len(remaining) > 1:
+        create_images([prompts[i] for i in remaining], model, topic, on_progress=on_progress,
+                      backend=backend, on_item_done=on_item_done)
+    else:
+        create_image(prompts[remaining[0]], model, topic, on_progress=on_progress, backend=backend)
+
+
+def _worker(backend: str) -> None:
+    while True:
+        job = _claim_next(backend)
+        if job is None:
+            due = _next_wakeup()
+            timeout = None if due is None else max(0.1, due - time.time())
+            with _wakeup:
+                _wakeup.wait(timeout)
+            continue
+
+        logger.info("Running job %s on %s (attempt %d)", job["id"], backend, job["attempts"])
+        try:
+            _run_job(job)
+        except Exception as e:
+            if job["attempts"] < MAX_ATTEMPTS:
+                logger.warning("Job %s failed (attempt %d/%d), requeueing: %s", job["id"], job["attempts"], MAX_ATTEMPTS, e)
+                _update(job["id"], status=QUEUED, error=str(e), not_before=time.time() + RETRY_DELAY)
+            else:
+                logger.error("Job %s failed: %s", job["id"], e)
+                _update(job["id"], status=FAILED, error=str(e))
+            continue
+        _update(job["id"], status=DONE, progress=1.0, error="")
+        logger.info("Job %s finished", job["id"])
+
+
+def _recover_interrupted() -> None:
+    with _db_lock:
+        conn = _get_connection()
+        recovered = conn.execute(
+            "UPDATE jobs SET status = ?, updated = ? WHERE status IN (?, ?)",
+            (QUEUED, time.time(), PROMPTING, RENDERING),
+        ).rowcount
+        conn.commit()
+    if recovered:
+        logger.info("Requeued %d job(s) interrupted by the last shutdown", recovered)
+
+
+def backend_concurrency(config) -> dict[str, int]:
+    """Worker slots per ComfyUI backend.
+
+    ``[comfyui] concurrency`` is either one number, applied to every URL in
+    ``comfyui_url``, or a comma-separated list matching those URLs in order;
+    backends without an entry get DEFAULT_CONCURRENCY.
+    """
+    from libs.comfy_pool import get_backend_urls
+    urls = get_backend_urls(config) or [DEFAULT_BACKEND]
+    values = [v.strip() for v in config.get("comfyui", "concurrency", fallback="").split(",") if v.strip()]
+    slots = {}
+    for index, url in enumerate(urls):
+        raw = values[0] if len(values) == 1 else (values[index] if index < len(values) else "")
+        try:
+            slots[url] = max(1, int(raw)) if raw else DEFAULT_CONCURRENCY
+        except ValueError:
+            logger.warning("Invalid concurrency '%s' for %s, using %d", raw, url, DEFAULT_CONCURRENCY)
+            slots[url] = DEFAULT_CONCURRENCY
+    return slots
+
+
+def start(config=None) -> None:
+    """Recovers interrupted jobs and starts the worker threads (once per process).
+
+    Each backend gets its own workers, so adding a GPU box to comfyui_url
+    adds render slots; changes take effect on restart.
+    """
+    if _workers:
+        return
+    cfg = config or load_config()
+    slots = backend_concurrency(cfg)
+    _recover_interrupted()
+    for backend, concurrency in slots.items():
+        for i in range(concurrency):
+            worker = threading.Thread(target=_worker, args=(backend,), name=f"job-worker-{len(_workers)}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+    logger.info("Job engine started with %d worker(s) over %d backend(s)", len(_workers), len(slots))
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from libs.generic import get_config_snapshot
+
+logger = logging.getLogger(__name__)
+
+# httpx-based clients are safe to share between threads. OpenWebUIClient
+# keeps per-chat state, so each caller leases one of its own.
+_SHARED_SERVICES = {"openrouter", "ollama"}
+
+_lock = threading.Lock()
+_entries: dict[tuple[str, str, str], dict] = {}
+_config_generation: int | None = None
+_stats = {"created": 0, "reused": 0, "invalidated": 0}
+
+
+def _make_client(service: str, base_url: str, api_key: str, model: str | None):
+    if service == "openrouter":
+        from openai import OpenAI
+        return OpenAI(base_url=base_url, api_key=api_key)
+    if service == "ollama":
+        from ollama import Client
+        return Client(host=base_url, headers={"Authorization": f"Bearer {api_key}"})
+    if service == "openwebui":
+        from openwebui_chat_client import OpenWebUIClient
+        return OpenWebUIClient(base_url=base_url, token=api_key, default_model_id=model)
+    raise ValueError(f"Unknown prompt service '{service}'")
+
+
+def _close(client) -> None:
+    try:
+        session = getattr(getattr(client, "_base_client", None), "session", None)
+        if session is not None:
+            session.close()
+        elif hasattr(client, "close"):
+            client.close()
+    except Exception as e:
+        logger.debug("Error closing LLM client: %s", e)
+
+
+def _pooled_connections(client) -> int | None:
+    """Best-effort count of keep-alive connections the client holds open."""
+    try:
+        session = getattr(getattr(client, "_base_client", None), "session", None)
+        if session is not None:
+            pools = [adapter.poolmanager.pools[key]
+                     for adapter in session.adapters.values()
+                     for key in adapter.poolmanager.pools.keys()]
+            return sum(1 for pool in pools for conn in list(pool.pool.queue) if conn is not None)
+        return len(client._client._transport._pool.connections)
+    except Exception:
+        return None
+
+
+def _sync_config_generation() -> None:
+    """Drops every client when the configuration has been reloaded. Caller holds _lock."""
+    global _config_generation
+    generation = get_config_snapshot().generation
+    if generation == _config_generation:
+        return
+    if _config_generation is not None and _entries:
+        logger.info("Configuration reloaded, dropping %d LLM client pool(s)", len(_entries))
+        for entry in _entries.values():
+            entry["retired"] = True
+            for client in entry["idle"]:
+                if entry["service"] not in _SHARED_SERVICES:
+                    _close(client)
+            entry["idle"].clear()
+        _stats["invalidated"] += len(_entries)
+        _entries.clear()
+    _config_generation = generation
+
+
+def _entry(service: str, base_url: str, api_key: str) -> dict:
+    key = (service, base_url, api_key)
+    entry = _entries.get(key)
+    if entry is None:
+        entry = {"service": service, "base_url": base_url, "created_at": time.time(),
+                 "clients": 0, "idle": [], "active": 0, "leases": 0, "retired": False}
+        _entries[key] = entry
+    return entry
+
+
+def get_client(service: str, base_url: str, api_key: str):
+    """Returns the shared keep-alive client for an httpx-based provider (openrouter, ollama)."""
+    if service not in _SHARED_SERVICES:
+        raise ValueError(f"'{service}' clients are not shareable, use lease()")
+    with _lock:
+        _sync_config_generation()
+        entry = _entry(service, base_url, api_key)
+        entry["leases"] += 1
+        if entry["idle"]:
+            _stats["reused"] += 1
+            return entry["idle"][0]
+        client = _make_client(service, base_url, api_key, None)
+        entry["idle"].append(client)
+        entry["clients"] += 1
+        _stats["created"] += 1
+        logger.info("Created %s client for %s", service, base_url)
+        return client
+
+
+@contextmanager
+def lease(service: str, base_url: str, api_key: str, model: str | None = None):
+    """Checks a client out of the pool for the duration of a request.
+
+    Shared providers hand out their one client; others get an idle client
+    of their own, or a new one when all are busy, returned to the pool on
+    exit.
+    """
+    if service in _SHARED_SERVICES:
+        yield get_client(service, base_url, api_key)
+        return
+
+    with _lock:
+        _sync_config_generation()
+        entry = _entry(service, base_url, api_key)
+        entry["leases"] += 1
+        entry["active"] += 1
+        client = entry["idle"].pop() if entry["idle"] else None
+        if client is not None:
+            _stats["reused"] += 1
+    try:
+        if client is None:
+            client = _make_client(service, base_url, api_key, model)
+            with _lock:
+                entry["clients"] += 1
+                _stats["created"] += 1
+            logger.info("Created %s client for %s", service, base_url)
+        yield client
+    finally:
+        with _lock:
+            entry["active"] -= 1
+            if client is not None:
+                if entry["retired"]:
+                    _close(client)
+                else:
+                    entry["idle"].append(client)
+
+
+def status() -> dict:
+    """Pool metrics: clients created versus reused, and per-pool connection counts."""
+    with _lock:
+        pools = []
+        for entry in _entries.values():
+            connections = [_pooled_connections(c) for c in entry["idle"]]
+            pools.append({
+                "service": entry["service"],
+                "base_url": entry["base_url"],
+                "age_seconds": round(time.time() - entry["created_at"]),
+                "clients": entry["clients"],
+                "idle": len(entry["idle"]),
+                "active": entry["active"],
+                "leases": entry["leases"],
+                "pooled_connections": sum(c for c in connections if c is not None),
+            })
+        return dict(_stats, pools=pools)
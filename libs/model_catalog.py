@@ -0,0 +1,193 @@
+import json
+import logging
+import threading
+import time
+
+from libs.generic import load_config, _atomic_write
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = "./model_catalog.json"
+MODELS_TTL = 300
+REFRESH_INTERVAL = 60.0
+# After a failed fetch, readers get what is cached (possibly None) instead of
+# fetching inline again, so an unreachable host does not stall every caller.
+FAILURE_BACKOFF = 60.0
+
+# Model lists by source: "comfyui:<url>", "openrouter", "ollama" or
+# "openwebui". Each entry is {"models": [...] | None, "fetched_at": float,
+# "failed_at": float}.
+_catalog: dict[str, dict] = {}
+_stale: set[str] = set()
+_used: set[str] = set()
+_condition = threading.Condition()
+_save_lock = threading.Lock()
+_thread: threading.Thread | None = None
+_loaded = False
+
+
+def _fetch_comfyui(url: str) -> list[str]:
+    import requests
+    from libs.comfy_pool import MODEL_LOADERS
+
+    models = set()
+    for node, param in MODEL_LOADERS.items():
+        # Per-node object_info is a few hundred bytes; the full listing runs
+        # to megabytes on a well-stocked ComfyUI.
+        response = requests.get(f"{url}/object_info/{node}", timeout=5)
+        response.raise_for_status()
+        choices = response.json().get(node, {}).get("input", {}).get("required", {}).get(param, [[]])[0]
+        if isinstance(choices, list):
+            models.update(choices)
+    return sorted(models)
+
+
+def _fetch_openrouter() -> list[str]:
+    from libs.openrouter import _get_client
+    return sorted((m.id for m in _get_client().models.list().data), key=str.lower)
+
+
+def _fetch_ollama() -> list[str]:
+    from libs.ollama import _get_client
+    return sorted((m.model for m in _get_client().list().models), key=str.lower)
+
+
+def _fetch_openwebui() -> list[str]:
+    from libs.llm_clients import lease
+
+    config = load_config()
+    section = config["openwebui"]
+    default_model = section.get("models", "").split(",")[0].strip()
+    with lease("openwebui", section["base_url"], section["api_key"], default_model) as client:
+        models = client.list_models() or []
+    return sorted((m["id"] for m in models if isinstance(m, dict) and "id" in m), key=str.lower)
+
+
+def _fetch(source: str) -> list[str]:
+    if source.startswith("comfyui:"):
+        return _fetch_comfyui(source.partition(":")[2])
+    if source == "openrouter":
+        return _fetch_openrouter()
+    if source == "ollama":
+        return _fetch_ollama()
+    if source == "openwebui":
+        return _fetch_openwebui()
+    raise ValueError(f"Unknown model source '{source}'")
+
+
+def _load() -> None:
+    """Seeds the catalog from disk so a restart serves model lists without waiting. Caller holds _condition."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    try:
+        with open(CATALOG_FILE) as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable model catalog %s: %s", CATALOG_FILE, e)
+        return
+    for source, entry in saved.items():
+        if isinstance(entry, dict) and isinstance(entry.get("models"), list):
+            _catalog.setdefault(source, {"models": entry["models"], "fetched_at": float(entry.get("fetched_at", 0)),
+                                         "failed_at": 0.0})
+
+
+def _save() -> None:
+    with _condition:
+        data = json.dumps({s: {"models": e["models"], "fetched_at": e["fetched_at"]}
+                           for s, e in _catalog.items() if e["models"] is not None})
+    try:
+        with _save_lock:
+            _atomic_write(CATALOG_FILE, data)
+    except OSError as e:
+        logger.warning("Failed to save model catalog: %s", e)
+
+
+def refresh(source: str) -> list[str] | None:
+    """Fetches a source's model list now, keeping the previous list if the fetch fails."""
+    try:
+        models = _fetch(source)
+    except Exception as e:
+        logger.warning("Failed to refresh models for %s: %s", source, e)
+        with _condition:
+            entry = _catalog.setdefault(source, {"models": None, "fetched_at": 0.0, "failed_at": 0.0})
+            entry["failed_at"] = time.time()
+            return entry["models"]
+    with _condition:
+        _catalog[source] = {"models": models, "fetched_at": time.time(), "failed_at": 0.0}
+        _stale.discard(source)
+    _save()
+    logger.debug("Refreshed %d model(s) for %s", len(models), source)
+    return models
+
+
+def get(source: str) -> list[str] | None:
+    """Returns the model list for a source, serving stale data while it revalidates.
+
+    Only a source that has never been fetched, here or in a previous run,
+    is fetched inline. An expired list is returned straight away and the
+    background thread refreshes it; without that thread it is refetched
+    inline. Within FAILURE_BACKOFF of a failed fetch nothing is fetched
+    inline: the cached list, or None, is returned as is.
+
+    Returns:
+        The model names, or None if the source has never answered.
+    """
+    with _condition:
+        _load()
+        _used.add(source)
+        entry = _catalog.get(source)
+        models = entry["models"] if entry is not None else None
+        now = time.time()
+        stale = models is not None and now - entry["fetched_at"] >= MODELS_TTL
+        failed_recently = entry is not None and now - entry["failed_at"] < FAILURE_BACKOFF
+        if models is not None and (not stale or _thread is not None or failed_recently):
+            if stale and _thread is not None:
+                _stale.add(source)
+                _condition.notify_all()
+            return models
+        if failed_recently:
+            return None
+    return refresh(source)
+
+
+def status() -> dict:
+    now = time.time()
+    with _condition:
+        _load()
+        return {
+            source: {
+                "models": len(entry["models"]) if entry["models"] is not None else None,
+                "age_seconds": round(now - entry["fetched_at"]) if entry["fetched_at"] else None,
+            }
+            for source, entry in _catalog.items()
+        }
+
+
+def _refresh_loop() -> None:
+    while True:
+        with _condition:
+            if not _stale:
+                _condition.wait(REFRESH_INTERVAL)
+            # Keep sources that were read recently warm; forget the rest.
+            now = time.time()
+            due = set(_stale) | {source for source in _used
+                                 if now - _catalog.get(source, {"fetched_at": 0.0})["fetched_at"] >= MODELS_TTL}
+            _stale.clear()
+            _used.clear()
+        for source in sorted(due):
+            refresh(source)
+
+
+def start(config=None) -> None:
+    """Starts the background refresh thread (once per process)."""
+    global _thread
+    if _thread is not None:
+        return
+    with _condition:
+        _load()
+    _thread = threading.Thread(target=_refresh_loop, name="model-catalog", daemon=True)
+    _thread.start()
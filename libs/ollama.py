@@ -1,67 +1,36 @@
 import logging
 import random
-import time
-from libs.generic import load_config, build_user_content, extract_prompt, SYSTEM_PROMPT, get_bool
+from libs.generic import load_config, get_config_snapshot, build_user_content, extract_prompt, extract_prompts, batch_instruction, SYSTEM_PROMPT
 
 logger = logging.getLogger(__name__)
 
-_CLOUD_MODELS_CACHE = None
-_CLOUD_MODELS_CACHE_TIME = 0.0
-_CLOUD_MODELS_CACHE_TTL = 300.0
+OLLAMA_CLOUD_URL = "https://ollama.com"
 
 
 def _get_client(config=None):
-    from ollama import Client
+    from libs.llm_clients import get_client
     cfg = config or load_config()
-    return Client(
-        host='https://ollama.com',
-        headers={'Authorization': f'Bearer {cfg["ollama"]["api_key"]}'}
-    )
+    return get_client("ollama", OLLAMA_CLOUD_URL, cfg["ollama"]["api_key"])
 
 
 def get_cloud_models():
-    global _CLOUD_MODELS_CACHE, _CLOUD_MODELS_CACHE_TIME
-
-    if _CLOUD_MODELS_CACHE is not None and (time.time() - _CLOUD_MODELS_CACHE_TIME) < _CLOUD_MODELS_CACHE_TTL:
-        return _CLOUD_MODELS_CACHE
-
-    config = load_config()
-    if not get_bool(config, "ollama", "enabled", False):
-        return []
-    try:
-        client = _get_client(config)
-        response = client.list()
-        all_models = [m.model for m in response.models]
-        result = sorted(all_models, key=str.lower)
-        _CLOUD_MODELS_CACHE = result
-        _CLOUD_MODELS_CACHE_TIME = time.time()
-        return result
-    except Exception as e:
-        logger.warning("Failed to fetch models from Ollama Cloud: %s", e)
-        if _CLOUD_MODELS_CACHE is not None:
-            return _CLOUD_MODELS_CACHE
+    """Models on Ollama Cloud, from the shared model catalog."""
+    from libs import model_catalog
+    if not get_config_snapshot().ollama_enabled:
         return []
+    return model_catalog.get("ollama") or []
 
 
-def _compute_effective_model(model, configured_models, client=None):
+def _compute_effective_model(model, configured_models):
     if model:
         original_model = model
-        try:
-            if client:
-                response = client.list()
-                all_models = [m.model for m in response.models]
-            else:
-                all_models = None
-
-            if all_models and model not in all_models:
-                if all_models:
-                    model = random.choice(all_models)
-                    logger.info("Specified model '%s' not found on Ollama Cloud, falling back to: %s", original_model, model)
-                else:
-                    model = random.choice(configured_models)
-                    logger.warning("Specified model '%s' not found, no cloud models available, using random configured model: %s", original_model, model)
-        except Exception as e:
-            logger.warning("Failed to fetch Ollama Cloud models for validation: %s. Falling back to configured models.", e)
+        all_models = get_cloud_models()
+        if all_models:
+            if model not in all_models:
+                model = random.choice(all_models)
+                logger.info("Specified model '%s' not found on Ollama Cloud, falling back to: %s", original_model, model)
+        else:
+            logger.warning("Ollama Cloud model list unavailable for validation. Falling back to configured models.")
             if model not in configured_models:
                 model = random.choice(configured_models)
                 logger.warning("Specified model '%s' not found, using random configured model: %s", original_model, model)
@@ -70,7 +39,7 @@ def _compute_effective_model(model, configured_models, client=None):
     return model
 
 
-def _chat_with_fallback(client, model, full_content, configured_models):
+def _chat_with_fallback(client, model, full_content, configured_models, parse=extract_prompt):
     try:
         response = client.chat(
             model=model,
@@ -79,7 +48,7 @@ def _chat_with_fallback(client, model, full_content, configured_models):
                 {"role": "user", "content": full_content},
             ]
         )
-        return extract_prompt(response.message.content)
+        return parse(response.message.content)
     except Exception as e:
         if "system" in str(e).lower() and ("instruction" in str(e).lower() or "message" in str(e).lower()):
             logger.info("Model %s doesn't support system messages, retrying with instructions in user message", model)
@@ -88,39 +57,44 @@ def _chat_with_fallback(client, model, full_content, configured_models):
                     model=model,
                     messages=[{"role": "user", "content": f"{SYSTEM_PROMPT}\n\n{full_content}"}]
                 )
-                return extract_prompt(response.message.content)
+                return parse(response.message.content)
             except Exception as e2:
                 logger.warning("Error with model %s on retry: %s. Trying fallback models.", model, e2)
-                return _try_fallback_models(client, configured_models, model, full_content)
+                return _try_fallback_models(client, configured_models, model, full_content, parse)
         else:
             logger.warning("Error with model %s: %s. Trying fallback models.", model, e)
-            return _try_fallback_models(client, configured_models, model, full_content)
+            return _try_fallback_models(client, configured_models, model, full_content, parse)
 
 
-def create_prompt_on_ollama(base_prompt: str, topic: str = "random", model: str = None) -> str:
-    config = load_config()
-    if not get_bool(config, "ollama", "enabled", False):
+def create_prompt_on_ollama(base_prompt: str, topic: str = "random", model: str = None, count: int = 1):
+    """Returns one prompt, or a list of up to ``count`` prompts when count > 1."""
+    snapshot = get_config_snapshot()
+    if not snapshot.ollama_enabled:
         logger.warning("Ollama Cloud is not enabled in the configuration.")
         return ""
 
     user_content, _ = build_user_content(topic)
     full_content = f"{base_prompt}\n\n{user_content}" if base_prompt else user_content
+    parse = extract_prompt
+    if count > 1:
+        full_content += batch_instruction(count)
+        parse = lambda text: extract_prompts(text)[:count]
 
-    configured_models = [m.strip() for m in config["ollama"]["models"].split(",") if m.strip()]
+    configured_models = list(snapshot.ollama_models)
     if not configured_models:
-        if get_bool(config, "ollama", "list_all_cloud_models", False):
+        if snapshot.ollama_list_all_cloud_models:
             configured_models = get_cloud_models()
         if not configured_models:
             logger.error("No Ollama Cloud models configured.")
             return ""
 
-    client = _get_client(config)
-    model = _compute_effective_model(model, configured_models, client)
+    client = _get_client()
+    model = _compute_effective_model(model, configured_models)
 
-    return _chat_with_fallback(client, model, full_content, configured_models)
+    return _chat_with_fallback(client, model, full_content, configured_models, parse)
 
 
-def _try_fallback_models(client, configured_models, failed_model, full_content):
+def _try_fallback_models(client, configured_models, failed_model, full_content, parse=extract_prompt):
     cloud_models = get_cloud_models()
     all_models = configured_models + cloud_models
     fallback_models = [m for m in all_models if m != failed_model]
@@ -136,7 +110,7 @@ def _try_fallback_models(client, configured_models, failed_model, full_content):
                 model=fallback_model,
                 messages=[{"role": "user", "content": f"{SYSTEM_PROMPT}\n\n{full_content}"}]
             )
-            result = extract_prompt(response.message.content)
+            result = parse(response.message.content)
             logger.info("Successfully generated prompt with fallback model: %s", fallback_model)
             return result
         except Exception as fallback_e:
@@ -1,41 +1,28 @@
 import logging
 import random
-import time
-from openai import OpenAI, RateLimitError
-from libs.generic import load_config, build_user_content, extract_prompt, SYSTEM_PROMPT, get_bool
+from openai import RateLimitError
+from libs.generic import load_config, get_config_snapshot, build_user_content, extract_prompt, extract_prompts, batch_instruction, SYSTEM_PROMPT
 
 logger = logging.getLogger(__name__)
 
-_FREE_MODELS_CACHE = None
-_FREE_MODELS_CACHE_TIME = 0.0
-_FREE_MODELS_CACHE_TTL = 300.0
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
+def _get_client(config=None):
+    from libs.llm_clients import get_client
+    cfg = config or load_config()
+    return get_client("openrouter", OPENROUTER_BASE_URL, cfg["openrouter"]["api_key"])
 
-def get_free_models():
-    global _FREE_MODELS_CACHE, _FREE_MODELS_CACHE_TIME
-
-    if _FREE_MODELS_CACHE is not None and (time.time() - _FREE_MODELS_CACHE_TIME) < _FREE_MODELS_CACHE_TTL:
-        return _FREE_MODELS_CACHE
 
-    config = load_config()
-    if not get_bool(config, "openrouter", "enabled", False):
-        return []
-    try:
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=config["openrouter"]["api_key"],
-        )
-        all_models_response = client.models.list()
-        all_models = [m.id for m in all_models_response.data]
-        free_models = sorted([m for m in all_models if "free" in m.lower()], key=str.lower)
-        _FREE_MODELS_CACHE = free_models
-        _FREE_MODELS_CACHE_TIME = time.time()
-        return free_models
-    except Exception as e:
-        logger.warning("Failed to fetch free models from OpenRouter: %s", e)
-        if _FREE_MODELS_CACHE is not None:
-            return _FREE_MODELS_CACHE
+def get_all_models() -> list[str] | None:
+    """Every model OpenRouter offers, from the shared model catalog; None if it never answered."""
+    from libs import model_catalog
+    if not get_config_snapshot().openrouter_enabled:
         return []
+    return model_catalog.get("openrouter")
+
+
+def get_free_models():
+    return [m for m in get_all_models() or [] if "free" in m.lower()]
 
 
 def _create_completion_with_fallback(client, model, full_content):
@@ -59,33 +46,34 @@ def _create_completion_with_fallback(client, model, full_content):
         raise
 
 
-def create_prompt_on_openrouter(base_prompt: str, topic: str = "random", model: str = None) -> str:
-    config = load_config()
-    if not get_bool(config, "openrouter", "enabled", False):
+def create_prompt_on_openrouter(base_prompt: str, topic: str = "random", model: str = None, count: int = 1):
+    """Returns one prompt, or a list of up to ``count`` prompts when count > 1."""
+    snapshot = get_config_snapshot()
+    if not snapshot.openrouter_enabled:
         logger.warning("OpenRouter is not enabled in the configuration.")
         return ""
 
     user_content, _ = build_user_content(topic)
     full_content = f"{base_prompt}\n\n{user_content}" if base_prompt else user_content
+    parse = extract_prompt
+    if count > 1:
+        full_content += batch_instruction(count)
+        parse = lambda text: extract_prompts(text)[:count]
 
-    configured_models = [m.strip() for m in config["openrouter"]["models"].split(",") if m.strip()]
+    configured_models = list(snapshot.openrouter_models)
     if not configured_models:
-        if get_bool(config, "openrouter", "list_all_free_models", False):
+        if snapshot.openrouter_list_all_free_models:
             configured_models = get_free_models()
         if not configured_models:
             logger.error("No OpenRouter models configured.")
             return ""
 
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=config["openrouter"]["api_key"],
-    )
+    client = _get_client()
 
     if model:
         original_model = model
-        try:
-            all_models_response = client.models.list()
-            all_models = [m.id for m in all_models_response.data]
+        all_models = get_all_models()
+        if all_models:
             if model not in all_models:
                 free_models = [m for m in all_models if "free" in m.lower()]
                 if free_models:
@@ -94,8 +82,8 @@ def create_prompt_on_openrouter(base_prompt: str, topic: str = "random", model:
                 else:
                     model = random.choice(configured_models)
                     logger.warning("Specified model '%s' not found, no free models available on OpenRouter, using random configured model: %s", original_model, model)
-        except Exception as e:
-            logger.warning("Failed to fetch OpenRouter models for validation: %s. Falling back to configured models.", e)
+        else:
+            logger.warning("OpenRouter model list unavailable for validation. Falling back to configured models.")
             if model not in configured_models:
                 free_models = [m for m in configured_models if "free" in m.lower()]
                 if free_models:
@@ -109,27 +97,18 @@ def create_prompt_on_openrouter(base_prompt: str, topic: str = "random", model:
 
     try:
         completion = _create_completion_with_fallback(client, model, full_content)
-        prompt = extract_prompt(completion.choices[0].message.content)
+        prompt = parse(completion.choices[0].message.content)
         logger.debug(prompt)
         return prompt
     except RateLimitError as e:
-        logger.warning("OpenRouter rate limit exceeded (429): %s. Falling back to local OpenWebUI model.", e)
-        if "openwebui" in config and "models" in config["openwebui"]:
-            from libs.openwebui import create_prompt_on_openwebui
-            openwebui_models = [m.strip() for m in config["openwebui"]["models"].split(",") if m.strip()]
-            if openwebui_models:
-                selected_model = random.choice(openwebui_models)
-                try:
-                    return create_prompt_on_openwebui(full_content, topic, selected_model)
-                except Exception as e2:
-                    logger.error("OpenWebUI fallback also failed: %s", e2)
-                    return "A colorful abstract composition"
-        logger.error("No OpenWebUI models configured for fallback.")
-        return "A colorful abstract composition"
+        # Raised rather than papered over with a placeholder prompt, so the
+        # prompt router counts the model as failing and asks another provider.
+        logger.warning("OpenRouter rate limit exceeded (429) for %s: %s", model, e)
+        raise
     except Exception as e:
         logger.warning("Primary model %s failed: %s. Trying fallback models.", model, e)
 
-        fallback_configured = [m.strip() for m in config["openrouter"]["models"].split(",") if m.strip()]
+        fallback_configured = list(snapshot.openrouter_models)
         free_models = get_free_models()
         all_models = fallback_configured + free_models
         fallback_models = [m for m in all_models if m != model]
@@ -145,7 +124,7 @@ def create_prompt_on_openrouter(base_prompt: str, topic: str = "random", model:
                     model=fallback_model,
                     messages=[{"role": "user", "content": f"{SYSTEM_PROMPT}\n\n{full_content}"}]
                 )
-                prompt = extract_prompt(completion.choices[0].message.content)
+                prompt = parse(completion.choices[0].message.content)
                 logger.info("Successfully generated prompt with fallback model: %s", fallback_model)
                 return prompt
             except Exception as fallback_e:
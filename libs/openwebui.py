@@ -1,35 +1,43 @@
 import logging
-from libs.generic import load_config, build_user_content, extract_prompt
-from openwebui_chat_client import OpenWebUIClient
+from libs.generic import load_config, get_config_snapshot, build_user_content, extract_prompt, extract_prompts, batch_instruction
+from libs import model_catalog
+from libs.llm_clients import lease
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 
-def create_prompt_on_openwebui(base_prompt: str, topic: str = "random", model: str = None) -> str:
+def create_prompt_on_openwebui(base_prompt: str, topic: str = "random", model: str = None, count: int = 1):
+    """Returns one prompt, or a list of up to ``count`` prompts when count > 1."""
     config = load_config()
     user_content, _ = build_user_content(topic)
     if base_prompt:
         full_content = f"{base_prompt}\n\n{user_content}"
     else:
         full_content = user_content
+    if count > 1:
+        full_content += batch_instruction(count)
 
-    model = model or config["openwebui"]["models"].split(",")[0].strip()
-
-    client = OpenWebUIClient(
-        base_url=config["openwebui"]["base_url"],
-        token=config["openwebui"]["api_key"],
-        default_model_id=model
-    )
+    configured_models = get_config_snapshot().openwebui_models
+    model = model or configured_models[0]
+    available = model_catalog.get("openwebui")
+    if available and model not in available:
+        fallback = next((m for m in configured_models if m in available), available[0])
+        logger.warning("Model '%s' not found on OpenWebUI, using %s", model, fallback)
+        model = fallback
 
     try:
-        result = client.chat(
-            question=full_content,
-            chat_title=datetime.now().strftime("%Y-%m-%d %H:%M"),
-            folder_name="ai-frame-image-server"
-        )
+        with lease("openwebui", config["openwebui"]["base_url"], config["openwebui"]["api_key"], model) as client:
+            result = client.chat(
+                question=full_content,
+                chat_title=datetime.now().strftime("%Y-%m-%d %H:%M"),
+                model_id=model,
+                folder_name="ai-frame-image-server"
+            )
 
         if result:
+            if count > 1:
+                return extract_prompts(result["response"])[:count]
             prompt = extract_prompt(result["response"])
             return prompt
         else:
@@ -0,0 +1,97 @@
+import logging
+import struct
+import zlib
+
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+_STOP_CHUNKS = (b"IDAT", b"IEND")
+_MAX_KEYWORD = 80
+
+
+class PngChunkError(ValueError):
+    pass
+
+
+def _decode_text(chunk_type: bytes, data: bytes) -> tuple[str, str]:
+    keyword, _, rest = data.partition(b"\x00")
+    key = keyword.decode("latin-1")
+    if chunk_type == b"tEXt":
+        return key, rest.decode("latin-1")
+    if chunk_type == b"zTXt":
+        return key, zlib.decompress(rest[1:]).decode("latin-1")
+
+    compressed, rest = rest[0], rest[2:]
+    _, _, rest = rest.partition(b"\x00")
+    _, _, text = rest.partition(b"\x00")
+    if compressed:
+        text = zlib.decompress(text)
+    return key, text.decode("utf-8")
+
+
+def read_png_header(path: str, keys: set[str] | None = None) -> tuple[tuple[int, int], dict[str, str]]:
+    """Reads the image size and text chunks of a PNG without decoding pixels.
+
+    The file is walked chunk by chunk and reading stops at the first IDAT, so
+    only the header and metadata bytes are touched. When ``keys`` is given,
+    text chunks with other keywords are skipped with a seek, and the walk ends
+    as soon as every requested key has been found.
+
+    Args:
+        path: Path to the PNG file.
+        keys: Optional set of text keywords to return.
+
+    Returns:
+        A tuple of ((width, height), {keyword: text}).
+
+    Raises:
+        PngChunkError: If the file is not a PNG or is truncated.
+    """
+    size = (0, 0)
+    texts: dict[str, str] = {}
+    with open(path, "rb") as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise PngChunkError(f"{path} is not a PNG file")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise PngChunkError(f"{path} is truncated")
+            length, chunk_type = struct.unpack(">I4s", header)
+            if chunk_type in _STOP_CHUNKS:
+                break
+
+            if chunk_type == b"IHDR":
+                data = f.read(length)
+                if len(data) < 8:
+                    raise PngChunkError(f"{path} has an invalid IHDR chunk")
+                size = struct.unpack(">II", data[:8])
+                f.seek(4, 1)
+            elif chunk_type in _TEXT_CHUNKS:
+                if keys is not None:
+                    prefix = f.read(min(length, _MAX_KEYWORD))
+                    keyword = prefix.partition(b"\x00")[0].decode("latin-1")
+                    if keyword not in keys:
+                        f.seek(length - len(prefix) + 4, 1)
+                        continue
+                    data = prefix + f.read(length - len(prefix))
+                else:
+                    data = f.read(length)
+                if len(data) < length:
+                    raise PngChunkError(f"{path} is truncated")
+                f.seek(4, 1)
+                try:
+                    key, text = _decode_text(chunk_type, data)
+                except (zlib.error, UnicodeDecodeError, IndexError) as e:
+                    logger.warning("Skipping unreadable %s chunk in %s: %s", chunk_type.decode(), path, e)
+                    continue
+                texts[key] = text
+                if keys is not None and keys.issubset(texts):
+                    break
+            else:
+                f.seek(length + 4, 1)
+    return size, texts
+
+
+def read_png_text(path: str, keys: set[str] | None = None) -> dict[str, str]:
+    return read_png_header(path, keys)[1]
@@ -0,0 +1,149 @@
+import logging
+import threading
+from collections import deque
+
+from libs.generic import (
+    get_config_snapshot,
+    load_config,
+    load_prompt_models_from_config,
+    load_recent_prompts,
+    build_user_content,
+    is_duplicate_prompt,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5
+DEDUPE_WINDOW = 200
+FAILURE_DELAY = 60.0
+
+# Buffered (prompt, topic) pairs, keyed by the topic they were requested for
+# ("" for no topic, "random", or a named topic).
+_buffers: dict[str, deque[tuple[str, str]]] = {}
+_condition = threading.Condition()
+_thread: threading.Thread | None = None
+
+
+def get_target_size(config=None) -> int:
+    cfg = config or load_config()
+    return max(0, cfg.getint("comfyui", "prompt_buffer_size", fallback=0))
+
+
+def get_batch_size(config=None) -> int:
+    cfg = config or load_config()
+    return max(1, cfg.getint("comfyui", "prompt_batch_size", fallback=DEFAULT_BATCH_SIZE))
+
+
+def take(topic: str = "") -> tuple[str, str] | None:
+    """Pops a buffered prompt for a topic and schedules a refill.
+
+    Prompts that were used since they were buffered are skipped.
+
+    Returns:
+        (prompt, topic) or None when the buffer for the topic is empty.
+    """
+    if _thread is None:
+        return None
+    recent = load_recent_prompts(DEDUPE_WINDOW)
+    with _condition:
+        buffer = _buffers.setdefault(topic, deque())
+        entry = None
+        while buffer:
+            candidate = buffer.popleft()
+            if not is_duplicate_prompt(candidate[0], recent):
+                entry = candidate
+                break
+        _condition.notify_all()
+    if entry is None:
+        logger.info("Prompt buffer for topic '%s' is empty", topic)
+    return entry
+
+
+def status() -> dict:
+    with _condition:
+        buffered = {topic: len(buffer) for topic, buffer in _buffers.items()}
+    return {"target": get_target_size(), "buffered": buffered}
+
+
+def _next_short_topic(target: int) -> str | None:
+    for topic, buffer in _buffers.items():
+        if len(buffer) < target:
+            return topic
+    return None
+
+
+def _fill(topic: str, count: int) -> int:
+    """Asks one prompt model, picked by the router, for several prompts at once.
+
+    Returns:
+        The number of new prompts added to the buffer.
+    """
+    from libs import prompt_router
+
+    choice = prompt_router.choose(load_prompt_models_from_config())
+    if choice is None:
+        raise RuntimeError("No prompt generation models configured")
+    service, model = choice
+
+    base_prompt = get_config_snapshot().base_prompt
+    recent = load_recent_prompts(DEDUPE_WINDOW)
+    user_content, selected_topic = build_user_content(topic, list(set(recent[-20:])))
+    result = prompt_router.call(service, model, base_prompt + "\n\n" + user_content, count=count)
+    if not result:
+        raise RuntimeError(f"{service}:{model} returned no prompts")
+    if isinstance(result, str):
+        result = [result]
+
+    added = 0
+    with _condition:
+        buffer = _buffers.setdefault(topic, deque())
+        seen = recent + [p for p, _ in buffer]
+        for prompt in result:
+            if is_duplicate_prompt(prompt, seen):
+                continue
+            buffer.append((prompt, selected_topic))
+            seen.append(prompt)
+            added += 1
+    logger.info("Buffered %d of %d prompt(s) for topic '%s' from %s:%s", added, len(result), topic, service, model)
+    return added
+
+
+def _refill_loop() -> None:
+    # Everything, config reads included, stays inside the try: a bad setting
+    # must not end the thread.
+    while True:
+        topic = None
+        try:
+            with _condition:
+                target = get_target_size()
+                topic = _next_short_topic(target)
+                while topic is None:
+                    _condition.wait()
+                    target = get_target_size()
+                    topic = _next_short_topic(target)
+                missing = target - len(_buffers[topic])
+            if _fill(topic, max(missing, get_batch_size())):
+                continue
+        except Exception as e:
+            if topic is None:
+                logger.warning("Prompt buffer refill failed: %s", e)
+            else:
+                logger.warning("Prompt buffer refill for topic '%s' failed: %s", topic, e)
+        with _condition:
+            _condition.wait(FAILURE_DELAY)
+
+
+def start(config=None) -> None:
+    """Starts the background refill thread when a prompt buffer is configured (once per process).
+
+    The buffer for scheduled generations (no topic) is filled right away;
+    other topics get a buffer the first time they are asked for.
+    """
+    global _thread
+    if _thread is not None or get_target_size(config) == 0:
+        return
+    with _condition:
+        _buffers.setdefault("", deque())
+    _thread = threading.Thread(target=_refill_loop, name="prompt-buffer", daemon=True)
+    _thread.start()
+    logger.info("Prompt buffer keeping %d prompt(s) per topic", get_target_size(config))
@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from libs import generic
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB = "./prompt_history.db"
+RING_SIZE = 500
+# Once the log outgrows this it is cut back to its last RING_SIZE lines; the
+# database keeps the full history.
+LOG_MAX_BYTES = 4 * 1024 * 1024
+MAX_QUERY_LIMIT = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL DEFAULT '',
+    prompt TEXT NOT NULL,
+    topic TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS prompts_date ON prompts (date);
+CREATE INDEX IF NOT EXISTS prompts_topic ON prompts (topic, date);
+CREATE INDEX IF NOT EXISTS prompts_model ON prompts (model, date);
+CREATE TABLE IF NOT EXISTS log_position (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+"""
+
+GROUPINGS = {
+    "topic": "topic",
+    "model": "model",
+    "date": "date",
+    "month": "substr(date, 1, 7)",
+    "year": "substr(date, 1, 4)",
+}
+
+_conn: sqlite3.Connection | None = None
+_lock = threading.Lock()
+# Newest last: (prompt, topic) of the most recent RING_SIZE entries.
+_recent: deque[tuple[str, str]] = deque(maxlen=RING_SIZE)
+_log_stamp: tuple | None = None
+
+
+def _log_path() -> str:
+    return generic.LOG_FILE
+
+
+def _get_connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(HISTORY_DB, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(_SCHEMA)
+        _conn.commit()
+        rows = _conn.execute("SELECT prompt, topic FROM prompts ORDER BY id DESC LIMIT ?", (RING_SIZE,)).fetchall()
+        _recent.extend((row["prompt"], row["topic"]) for row in reversed(rows))
+    return _conn
+
+
+def _lock_log():
+    return generic._acquire_lock(generic._file_lock_path(_log_path()))
+
+
+def _stat_log() -> tuple | None:
+    try:
+        st = os.stat(_log_path())
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _ingest(conn: sqlite3.Connection) -> int:
+    """Indexes log lines written since the last call. Caller holds _lock and the log lock.
+
+    A log that was replaced (new inode) or truncated is read from the start.
+    """
+    global _log_stamp
+    stamp = _stat_log()
+    if stamp is None:
+        _log_stamp = None
+        return 0
+    inode, size, _ = stamp
+    row = conn.execute("SELECT inode, offset FROM log_position WHERE id = 1").fetchone()
+    offset = row["offset"] if row is not None and row["inode"] == inode and row["offset"] <= size else 0
+    if row is not None and offset == 0 and row["offset"]:
+        logger.info("Prompt log was rotated or truncated, re-reading it from the start")
+
+    entries = []
+    with open(_log_path(), "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # a line still being written
+            offset += len(raw)
+            try:
+                data = json.loads(raw)
+                entries.append((str(data.get("date", "")), data["prompt"], data.get("topic") or "", data.get("model") or ""))
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    conn.executemany("INSERT INTO prompts (date, prompt, topic, model) VALUES (?, ?, ?, ?)", entries)
+    conn.execute("INSERT OR REPLACE INTO log_position (id, inode, offset) VALUES (1, ?, ?)", (inode, offset))
+    conn.commit()
+    _recent.extend((prompt, topic) for _, prompt, topic, _ in entries)
+    _log_stamp = _stat_log()
+    return len(entries)
+
+
+def _compact_log(conn: sqlite3.Connection) -> None:
+    """Cuts the log back to its newest lines. Caller holds _lock and the log lock, after _ingest."""
+    path = _log_path()
+    lines = generic._read_last_lines(path, RING_SIZE)
+    generic._atomic_write(path, "".join(line + "\n" for line in lines))
+    stamp = _stat_log()
+    conn.execute("INSERT OR REPLACE INTO log_position (id, inode, offset) VALUES (1, ?, ?)", (stamp[0], stamp[1]))
+    conn.commit()
+    global _log_stamp
+    _log_stamp = stamp
+    logger.info("Compacted %s to its last %d entries", path, len(lines))
+
+
+def sync() -> int:
+    """Indexes anything appended to the log by other writers; returns the number of new entries."""
+    with _lock:
+        conn = _get_connection()
+        if _stat_log() == _log_stamp:
+            return 0
+        lock_fd = _lock_log()
+        try:
+            return _ingest(conn)
+        finally:
+            generic._release_lock(lock_fd)
+
+
+def record(prompt: str, topic: str = "", model: str = "") -> None:
+    """Appends a prompt to the log and the index. Safe across threads and processes."""
+    entry = {"date": datetime.now().strftime("%Y-%m-%d"), "prompt": prompt, "topic": topic, "model": model or ""}
+    with _lock:
+        conn = _get_connection()
+        lock_fd = _lock_log()
+        try:
+            with open(_log_path(), "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            _ingest(conn)
+            if _log_stamp is not None and _log_stamp[1] > LOG_MAX_BYTES:
+                _compact_log(conn)
+        finally:
+            generic._release_lock(lock_fd)
+
+
+def recent_prompts(count: int = 20) -> list[str]:
+    """The last ``count`` prompts, oldest first, from memory."""
+    sync()
+    with _lock:
+        return [prompt for prompt, _ in list(_recent)[-count:]]
+
+
+def recent_topics(count: int = 5) -> list[str]:
+    """The non-empty topics among the last ``count`` entries, oldest first."""
+    sync()
+    with _lock:
+        return [topic for _, topic in list(_recent)[-count:] if topic]
+
+
+def query(
+    since: str | None = None,
+    until: str | None = None,
+    topic: str | None = None,
+    model: str | None = None,
+    text: str | None = None,
+    limit: int = 100,
+    offset: int = 0,
+) -> list[dict]:
+    """Searches the full history, newest first.
+
+    Args:
+        since, until: Inclusive YYYY-MM-DD bounds (a YYYY or YYYY-MM prefix
+            also works for ``since``).
+        topic, model: Exact matches.
+        text: Substring of the prompt.
+    """
+    clauses, params = [], []
+    if since:
+        clauses.append("date >= ?")
+        params.append(since)
+    if until:
+        clauses.append("date <= ?")
+        params.append(until)
+    if topic is not None:
+        clauses.append("topic = ?")
+        params.append(topic)
+    if model is not None:
+        clauses.append("model = ?")
+        params.append(model)
+    if text:
+        clauses.append("prompt LIKE ? ESCAPE '\\'")
+        params.append("%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    sql = "SELECT date, prompt, topic, model FROM prompts"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY id DESC LIMIT ? OFFSET ?"
+    params += [max(1, min(limit, MAX_QUERY_LIMIT)), max(0, offset)]
+
+    sync()
+    with _lock:
+        return [dict(row) for row in _get_connection().execute(sql, params)]
+
+
+def counts(by: str = "topic", since: str | None = None, until: str | None = None) -> list[dict]:
+    """Number of prompts per topic, model, date, month or year, largest first for topic/model."""
+    if by not in GROUPINGS:
+        raise ValueError(f"Cannot group prompts by '{by}'")
+    key = GROUPINGS[by]
+    clauses, params = [], []
+    if since:
+        clauses.append("date >= ?")
+        params.append(since)
+    if until:
+        clauses.append("date <= ?")
+        params.append(until)
+    sql = f"SELECT {key} AS key, COUNT(*) AS count FROM prompts"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " GROUP BY key ORDER BY " + ("count DESC, key" if by in ("topic", "model") else "key")
+
+    sync()
+    with _lock:
+        return [dict(row) for row in _get_connection().execute(sql, params)]
+
+
+def start() -> None:
+    """Indexes the existing log, so the first request does not pay for it."""
+    started = time.monotonic()
+    added = sync()
+    if added:
+        logger.info("Indexed %d prompt(s) from %s in %.1fs", added, _log_path(), time.monotonic() - started)
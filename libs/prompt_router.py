@@ -0,0 +1,188 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from libs.generic import (
+    build_user_content,
+    load_prompt_models_from_config,
+    call_prompt_service,
+    is_duplicate_prompt,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+LATENCY_WINDOW = 50
+MIN_SAMPLES = 5
+HEDGE_PERCENTILE = 0.9
+DEFAULT_HEDGE_DELAY = 10.0
+MIN_HEDGE_DELAY = 1.0
+DEFAULT_LATENCY = 5.0
+ERROR_DECAY = 0.2
+MIN_WEIGHT = 0.01
+
+FALLBACK_PROMPT = "A colorful abstract composition"
+
+_lock = threading.Lock()
+# Per (service, model): recent latencies of successful calls and a
+# decaying error rate.
+_stats: dict[tuple[str, str], dict] = {}
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="prompt-router")
+
+
+def _stat(key: tuple[str, str]) -> dict:
+    stat = _stats.get(key)
+    if stat is None:
+        stat = {"latencies": deque(maxlen=LATENCY_WINDOW), "error_rate": 0.0, "calls": 0, "failures": 0}
+        _stats[key] = stat
+    return stat
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def record(service: str, model: str, latency: float, ok: bool) -> None:
+    with _lock:
+        stat = _stat((service, model))
+        stat["calls"] += 1
+        if ok:
+            stat["latencies"].append(latency)
+        else:
+            stat["failures"] += 1
+        stat["error_rate"] += ERROR_DECAY * ((0.0 if ok else 1.0) - stat["error_rate"])
+
+
+def hedge_delay(service: str, model: str) -> float:
+    """Seconds to wait on a model before asking another: its latency percentile, or everyone's while it is new."""
+    with _lock:
+        samples = _stat((service, model))["latencies"]
+        if len(samples) < MIN_SAMPLES:
+            samples = [l for s in _stats.values() for l in s["latencies"]]
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return max(MIN_HEDGE_DELAY, _percentile(samples, HEDGE_PERCENTILE))
+
+
+def _weight(key: tuple[str, str]) -> float:
+    stat = _stat(key)
+    latency = _percentile(stat["latencies"], 0.5) if stat["latencies"] else DEFAULT_LATENCY
+    return max(MIN_WEIGHT, (1.0 - stat["error_rate"]) / max(latency, 0.1))
+
+
+def choose(prompt_models: list[tuple[str, str]], exclude=()) -> tuple[str, str] | None:
+    """Picks a prompt model, favouring fast, healthy ones.
+
+    Models in ``exclude`` are skipped while others remain, and other
+    services are preferred over the services already excluded, so a hedge
+    goes to a different provider when there is one.
+    """
+    if not prompt_models:
+        return None
+    candidates = [m for m in prompt_models if m not in exclude] or list(prompt_models)
+    excluded_services = {service for service, _ in exclude}
+    candidates = [m for m in candidates if m[0] not in excluded_services] or candidates
+    with _lock:
+        weights = [_weight(m) for m in candidates]
+    return random.choices(candidates, weights=weights)[0]
+
+
+def call(service: str, model: str, full_prompt: str, count: int = 1):
+    """Calls a prompt service and records how long it took and whether it answered.
+
+    An empty answer or the placeholder FALLBACK_PROMPT counts as a failure
+    and is returned as None.
+    """
+    start = time.monotonic()
+    try:
+        result = call_prompt_service(service, model, full_prompt, count=count)
+    except Exception:
+        record(service, model, time.monotonic() - start, ok=False)
+        raise
+    if result == FALLBACK_PROMPT or (isinstance(result, list) and FALLBACK_PROMPT in result):
+        result = None
+    record(service, model, time.monotonic() - start, ok=bool(result))
+    return result or None
+
+
+def generate(base_prompt: str, topic: str = "random", recent_prompts: list[str] | None = None) -> tuple[str | None, str]:
+    """Generates one new prompt, hedging slow providers.
+
+    The first model is chosen by weight. If it has not answered within its
+    hedge delay, or answers with an error or a duplicate, another model is
+    asked too, up to MAX_ATTEMPTS in total. The first valid, non-duplicate
+    answer wins; slower calls finish in the background and only update the
+    latency statistics.
+
+    Returns:
+        (prompt, selected_topic); prompt is None if every answer was a
+        duplicate.
+    """
+    prompt_models = load_prompt_models_from_config()
+    if not prompt_models:
+        logger.warning("No prompt generation models configured.")
+        return None, ""
+
+    recent_prompts = recent_prompts or []
+    tried: list[tuple[str, str]] = []
+    pending = {}
+    got_duplicate = False
+
+    def launch() -> None:
+        service, model = choose(prompt_models, tried)
+        tried.append((service, model))
+        user_content, selected_topic = build_user_content(topic, recent_prompts)
+        future = _executor.submit(call, service, model, base_prompt + "\n\n" + user_content)
+        pending[future] = (service, model, selected_topic)
+        logger.info("Generating prompt with %s:%s (attempt %d/%d)", service, model, len(tried), MAX_ATTEMPTS)
+
+    launch()
+    while pending:
+        timeout = hedge_delay(*tried[-1]) if len(tried) < MAX_ATTEMPTS else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            logger.info("%s:%s slower than %.1fs, hedging with another model", *tried[-1], timeout)
+            launch()
+            continue
+
+        for future in done:
+            service, model, selected_topic = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning("Prompt generation with %s:%s failed: %s", service, model, e)
+                result = None
+            if result and not is_duplicate_prompt(result, recent_prompts):
+                return result, selected_topic
+            if result:
+                got_duplicate = True
+                logger.warning("%s:%s generated a duplicate prompt", service, model)
+            if len(tried) < MAX_ATTEMPTS:
+                launch()
+
+    if got_duplicate:
+        logger.warning("All %d attempts produced duplicate prompts.", MAX_ATTEMPTS)
+        return None, ""
+    logger.error("All %d prompt generation attempts failed.", MAX_ATTEMPTS)
+    return FALLBACK_PROMPT, ""
+
+
+def status() -> list[dict]:
+    with _lock:
+        return [
+            {
+                "service": service,
+                "model": model,
+                "calls": stat["calls"],
+                "failures": stat["failures"],
+                "error_rate": round(stat["error_rate"], 3),
+                "p50_seconds": round(_percentile(stat["latencies"], 0.5), 2) if stat["latencies"] else None,
+                "p90_seconds": round(_percentile(stat["latencies"], 0.9), 2) if stat["latencies"] else None,
+                "weight": round(_weight((service, model)), 4),
+            }
+            for (service, model), stat in sorted(_stats.items())
+        ]
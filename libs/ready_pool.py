@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+
+from libs.generic import load_config, new_image_filename
+from libs.create_thumbnail import generate_derivatives
+
+logger = logging.getLogger(__name__)
+
+READY_DIRNAME = "ready"
+IDLE_CHECK_INTERVAL = 30.0
+FAILURE_DELAY = 300.0
+
+_wakeup = threading.Condition()
+_advance_lock = threading.Lock()
+_thread: threading.Thread | None = None
+
+
+def _output_dir(config=None) -> str:
+    cfg = config or load_config()
+    return cfg["comfyui"]["output_dir"].rstrip("/")
+
+
+def get_ready_dir(output_dir: str | None = None) -> str:
+    return os.path.join(output_dir or _output_dir(), READY_DIRNAME)
+
+
+def get_target_size(config=None) -> int:
+    cfg = config or load_config()
+    return max(0, cfg.getint("frame", "ready_pool_size", fallback=0))
+
+
+def list_ready(output_dir: str | None = None) -> list[str]:
+    """Paths of the pre-rendered images waiting to be shown, oldest first."""
+    ready_dir = get_ready_dir(output_dir)
+    try:
+        names = sorted(e.name for e in os.scandir(ready_dir)
+                       if e.is_file() and e.name.endswith(".png") and not e.name.startswith("."))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(ready_dir, name) for name in names]
+
+
+def advance(output_dir: str | None = None) -> str | None:
+    """Shows the next pre-rendered image, if there is one.
+
+    The image and its derivatives were built ahead of time, so this only
+    renames files: the frame gets a new picture instantly.
+
+    Returns:
+        The pool file name of the image now showing, or None if the pool
+        was empty.
+    """
+    from libs.comfyui import promote_ready_image
+
+    output_dir = output_dir or _output_dir()
+    with _advance_lock:
+        ready = list_ready(output_dir)
+        if not ready:
+            return None
+        promote_ready_image(ready[0], output_dir)
+    logger.info("Advanced the frame to pre-rendered image %s (%d left)", os.path.basename(ready[0]), len(ready) - 1)
+    with _wakeup:
+        _wakeup.notify_all()
+    return os.path.basename(ready[0])
+
+
+def status() -> dict:
+    return {"ready": len(list_ready()), "target": get_target_size()}
+
+
+def _gpu_idle() -> bool:
+    from libs.comfyui import get_queue_count
+    from libs.jobs import has_active_jobs
+
+    return not has_active_jobs() and get_queue_count() == 0
+
+
+def _fill_one(output_dir: str) -> None:
+    from libs.comfyui import render_images
+    from libs.jobs import generate_prompt
+
+    prompt, _ = generate_prompt("", "")
+    if not prompt:
+        raise RuntimeError("Prompt generation returned nothing")
+
+    ready_dir = get_ready_dir(output_dir)
+    os.makedirs(ready_dir, exist_ok=True)
+    for temp_path in render_images(prompt, output_dir=ready_dir):
+        ready_path = os.path.join(ready_dir, new_image_filename())
+        os.replace(temp_path, ready_path)
+        generate_derivatives(ready_path)
+        logger.info("Added %s to the ready pool", os.path.basename(ready_path))
+
+
+def _refill_loop() -> None:
+    while True:
+        delay = IDLE_CHECK_INTERVAL
+        try:
+            config = load_config()
+            output_dir = _output_dir(config)
+            if len(list_ready(output_dir)) < get_target_size(config) and _gpu_idle():
+                _fill_one(output_dir)
+                delay = 0
+        except Exception as e:
+            logger.warning("Ready pool refill failed: %s", e)
+            delay = FAILURE_DELAY
+        if delay:
+            with _wakeup:
+                _wakeup.wait(delay)
+
+
+def start(config=None) -> None:
+    """Starts the background refill thread when a ready pool is configured (once per process)."""
+    global _thread
+    if _thread is not None or get_target_size(config) == 0:
+        return
+    _thread = threading.Thread(target=_refill_loop, name="ready-pool", daemon=True)
+    _thread.start()
+    logger.info("Ready pool keeping %d image(s) pre-rendered", get_target_size(config))
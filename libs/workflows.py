@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Which node input each job parameter goes into, per workflow. Nodes are
+# addressed by their title, as in the ComfyUI editor; every node sharing a
+# title gets the value.
+WORKFLOW_SPECS = {
+    "SDXL": {
+        "path": "./workflow_sdxl.json",
+        "output": "Save Image",
+        "params": {
+            "prompt": ("Positive", "text"),
+            "seed": ("KSampler", "seed"),
+            "filename_prefix": ("Save Image", "filename_prefix"),
+            "model": ("Load Checkpoint", "ckpt_name"),
+            "width": ("Empty Latent Image", "width"),
+            "height": ("Empty Latent Image", "height"),
+        },
+    },
+    "FLUX": {
+        "path": "./workflow_flux.json",
+        "output": "Save Image",
+        "params": {
+            "prompt": ("CLIP Text Encode (Positive Prompt)", "text"),
+            "seed": ("RandomNoise", "noise_seed"),
+            "filename_prefix": ("Save Image", "filename_prefix"),
+            "model": ("UnetLoaderGGUFDisTorchMultiGPU", "unet_name"),
+            "width": ("CR Aspect Ratio", "width"),
+            "height": ("CR Aspect Ratio", "height"),
+        },
+    },
+    "Qwen": {
+        "path": "./workflow_qwen.json",
+        "output": "Save Image",
+        "params": {
+            "prompt": ("Positive", "text"),
+            "seed": ("KSampler", "seed"),
+            "filename_prefix": ("Save Image", "filename_prefix"),
+            "model": ("Load Checkpoint", "unet_name"),
+            "width": ("CR Aspect Ratio", "width"),
+            "height": ("CR Aspect Ratio", "height"),
+        },
+    },
+}
+
+_lock = threading.Lock()
+_templates: dict[str, dict] = {}
+
+
+class WorkflowError(ValueError):
+    """A workflow file is missing, unreadable or does not match its spec."""
+
+
+def _load_template(name: str, spec: dict, stamp: tuple[int, int]) -> dict:
+    path = spec["path"]
+    try:
+        with open(path) as f:
+            workflow = json.load(f)
+    except (OSError, ValueError) as e:
+        raise WorkflowError(f"Cannot load workflow '{name}' from {path}: {e}") from e
+    if not isinstance(workflow, dict):
+        raise WorkflowError(f"Workflow '{name}' in {path} is not in ComfyUI API format")
+
+    titles: dict[str, list[str]] = {}
+    for node_id, node in workflow.items():
+        try:
+            titles.setdefault(node["_meta"]["title"], []).append(node_id)
+        except (KeyError, TypeError) as e:
+            raise WorkflowError(f"Node {node_id} in workflow '{name}' has no title") from e
+
+    bindings = {}
+    for param, (title, input_name) in spec["params"].items():
+        node_ids = titles.get(title)
+        if not node_ids:
+            raise WorkflowError(f"Workflow '{name}' has no node titled '{title}' for '{param}'")
+        bindings[param] = (tuple(node_ids), input_name)
+
+    outputs = titles.get(spec["output"])
+    if not outputs:
+        raise WorkflowError(f"Workflow '{name}' has no output node titled '{spec['output']}'")
+
+    logger.info("Loaded workflow template '%s' from %s", name, path)
+    return {"name": name, "stamp": stamp, "workflow": workflow, "bindings": bindings, "output_node": outputs[0]}
+
+
+def get_template(name: str) -> dict:
+    """Returns the parsed, validated template for a workflow, reloading it when its file changes.
+
+    Raises:
+        WorkflowError: If the workflow is unknown, unreadable or invalid.
+    """
+    spec = WORKFLOW_SPECS.get(name)
+    if spec is None:
+        raise WorkflowError(f"Unknown workflow '{name}'")
+    try:
+        st = os.stat(spec["path"])
+    except OSError as e:
+        raise WorkflowError(f"Cannot load workflow '{name}' from {spec['path']}: {e}") from e
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    with _lock:
+        template = _templates.get(name)
+        if template is not None and template["stamp"] == stamp:
+            return template
+        template = _load_template(name, spec, stamp)
+        _templates[name] = template
+        return template
+
+
+def instantiate(name: str, **values) -> tuple[dict, str]:
+    """Builds a job's workflow from a template.
+
+    Only the nodes that receive a value are copied; every other node is
+    shared with the template, which must therefore never be mutated.
+
+    Args:
+        name: Workflow name, a key of WORKFLOW_SPECS.
+        **values: Job parameters by spec name (prompt, seed, model, ...).
+            None values leave the template default in place.
+
+    Returns:
+        (workflow, output_node_id), ready for ComfyUI's /prompt endpoint.
+    """
+    template = get_template(name)
+    workflow = dict(template["workflow"])
+    copied = set()
+    for param, value in values.items():
+        if value is None:
+            continue
+        binding = template["bindings"].get(param)
+        if binding is None:
+            raise WorkflowError(f"Workflow '{name}' has no parameter '{param}'")
+        node_ids, input_name = binding
+        for node_id in node_ids:
+            if node_id not in copied:
+                node = workflow[node_id]
+                workflow[node_id] = dict(node, inputs=dict(node["inputs"]))
+                copied.add(node_id)
+            workflow[node_id]["inputs"][input_name] = value
+    return workflow, template["output_node"]
@@ -1,12 +1,14 @@
-from . import auth_routes, create_routes, favourites_routes, gallery_routes, image_routes, index_routes, job_routes, settings_routes
+from . import auth_routes, create_routes, event_routes, favourites_routes, gallery_routes, image_routes, index_routes, job_routes, prompt_routes, settings_routes
 
 __all__ = [
     "auth_routes",
     "create_routes",
+    "event_routes",
     "favourites_routes",
     "gallery_routes",
     "image_routes",
     "index_routes",
     "job_routes",
+    "prompt_routes",
     "settings_routes"
 ]
@@ -1,16 +1,46 @@
+import logging
 import re
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
 from flask import Blueprint, render_template, redirect, url_for, session, request, flash
-from libs.comfyui import create_image, select_model, get_available_models, get_queue_count
+from libs.comfyui import get_queue_count
 from libs.generic import (
     load_models_from_config, load_topics_from_config, load_openrouter_models_from_config,
     load_openwebui_models_from_config, load_ollama_models_from_config,
-    create_prompt_with_random_model, get_bool, load_config
+    get_bool, load_config
 )
+from libs.jobs import MAX_BATCH, get_job, submit_job
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint("create_routes", __name__)
 user_config = None
-_executor = ThreadPoolExecutor(max_workers=2)
+
+# Seconds each lookup may take before the page renders without it. Late
+# lookups keep running and refresh the cache for the next page load.
+SOURCE_DEADLINES = {
+    "comfyui": 0.5,
+    "openwebui": 1.0,
+    "openrouter": 1.5,
+    "ollama": 1.5,
+    "queue": 1.0,
+    "topics": 0.5,
+}
+_SOURCE_DEFAULTS = {
+    "comfyui": ([], [], []),
+    "openwebui": [],
+    "openrouter": ([], []),
+    "ollama": ([], []),
+    "queue": 0,
+    "topics": [],
+}
+
+_executor = ThreadPoolExecutor(max_workers=len(SOURCE_DEADLINES), thread_name_prefix="create-page")
+_sources_lock = threading.Lock()
+_last_results: dict[str, object] = {}
+_in_flight: dict[str, object] = {}
 
 _SAFE_FILENAME_RE = re.compile(r'^[\w\-. ]+$', re.UNICODE)
 _MAX_PROMPT_LENGTH = 2000
@@ -40,64 +70,107 @@ def _validate_topic(topic: str) -> str:
     return topic
 
 
+def _source_loaders():
+    return {
+        "comfyui": load_models_from_config,
+        "openwebui": load_openwebui_models_from_config,
+        "openrouter": load_openrouter_models_from_config,
+        "ollama": load_ollama_models_from_config,
+        "queue": get_queue_count,
+        "topics": load_topics_from_config,
+    }
+
+
+def _remember(source: str, future) -> None:
+    with _sources_lock:
+        if _in_flight.get(source) is future:
+            del _in_flight[source]
+        if future.exception() is None:
+            _last_results[source] = future.result()
+        else:
+            logger.warning("Loading %s for the create page failed: %s", source, future.exception())
+
+
+def _fan_out() -> tuple[dict, list[str]]:
+    """Runs every lookup at once, each bounded by its deadline.
+
+    Returns:
+        (results by source, sources that missed their deadline or failed and
+        are shown from the last good result or empty).
+    """
+    futures, started = {}, []
+    with _sources_lock:
+        for source, loader in _source_loaders().items():
+            future = _in_flight.get(source)
+            if future is None:
+                future = _executor.submit(loader)
+                _in_flight[source] = future
+                started.append(source)
+            futures[source] = future
+    # Outside the lock: a future that already finished runs its callback here.
+    for source in started:
+        futures[source].add_done_callback(lambda f, source=source: _remember(source, f))
+
+    start = time.monotonic()
+    for source in sorted(futures, key=SOURCE_DEADLINES.get):
+        remaining = SOURCE_DEADLINES[source] - (time.monotonic() - start)
+        wait([futures[source]], timeout=max(0.0, remaining))
+
+    results, stale = {}, []
+    for source, future in futures.items():
+        if future.done() and future.exception() is None:
+            results[source] = future.result()
+            continue
+        stale.append(source)
+        with _sources_lock:
+            results[source] = _last_results.get(source, _SOURCE_DEFAULTS[source])
+    if stale:
+        logger.info("Create page rendered with stale %s", ", ".join(sorted(stale)))
+    return results, sorted(stale)
+
+
 def _load_models_and_topics():
-    sdxl_models, flux_models, qwen_models = load_models_from_config()
-    openwebui_models = load_openwebui_models_from_config()
-    openrouter_models, openrouter_free_models = load_openrouter_models_from_config()
-    ollama_models, ollama_cloud_models = load_ollama_models_from_config()
-    queue_count = get_queue_count()
-    topics = load_topics_from_config()
+    results, stale = _fan_out()
+    sdxl_models, flux_models, qwen_models = results["comfyui"]
+    openrouter_models, openrouter_free_models = results["openrouter"]
+    ollama_models, ollama_cloud_models = results["ollama"]
     return {
         "sdxl_models": sdxl_models,
         "flux_models": flux_models,
         "qwen_models": qwen_models,
-        "openwebui_models": openwebui_models,
+        "openwebui_models": results["openwebui"],
         "openrouter_models": openrouter_models,
         "openrouter_free_models": openrouter_free_models,
         "ollama_models": ollama_models,
         "ollama_cloud_models": ollama_cloud_models,
-        "topics": topics,
-        "queue_count": queue_count
+        "topics": results["topics"],
+        "queue_count": results["queue"],
+        "max_batch": MAX_BATCH,
+        "stale_sources": stale,
     }
 
 
 @bp.route("/create", methods=["GET", "POST"])
 def create():
-    config = load_config()
     if request.method == "POST":
         prompt = _validate_prompt(request.form.get("prompt", ""))
         image_model = _validate_model(request.form.get("model") or "Random Image Model")
         topic = _validate_topic(request.form.get("topic", ""))
-        selected_workflow, model = select_model(image_model)
 
-        selected_topic = ""
+        prompt_model = ""
         if not prompt:
             prompt_model = request.form.get("prompt_model") or ""
-            if prompt_model and prompt_model != "Random Prompt Model":
-                if ":" in prompt_model:
-                    service, service_model = prompt_model.split(":", 1)
-                    if not _SAFE_FILENAME_RE.match(service_model):
-                        flash("Invalid prompt model specified.", "error")
-                        return redirect(url_for("create_routes.create_image_page"))
-                else:
-                    service, service_model = prompt_model, ""
-                if service == "openwebui":
-                    from libs.openwebui import create_prompt_on_openwebui
-                    prompt = create_prompt_on_openwebui(config["comfyui"]["prompt"], topic, service_model)
-                elif service == "openrouter":
-                    from libs.openrouter import create_prompt_on_openrouter
-                    prompt = create_prompt_on_openrouter(config["comfyui"]["prompt"], topic, service_model)
-                elif service == "ollama":
-                    from libs.ollama import create_prompt_on_ollama
-                    prompt = create_prompt_on_ollama(config["comfyui"]["prompt"], topic, service_model)
-                selected_topic = topic if topic and topic != "random" else ""
-            else:
-                prompt, selected_topic = create_prompt_with_random_model(config["comfyui"]["prompt"], topic)
+            if prompt_model and prompt_model != "Random Prompt Model" and ":" in prompt_model:
+                _, service_model = prompt_model.split(":", 1)
+                if not _SAFE_FILENAME_RE.match(service_model):
+                    flash("Invalid prompt model specified.", "error")
+                    return redirect(url_for("create_routes.create_image_page"))
         else:
-            selected_topic = topic if topic and topic != "random" else ""
+            topic = topic if topic and topic != "random" else ""
 
-        _executor.submit(create_image, prompt, model, selected_topic)
-        return redirect(url_for("create_routes.image_queued", prompt=prompt, model=model.split(".")[0]))
+        count = max(1, min(request.form.get("count", 1, type=int), MAX_BATCH))
+        job_id = submit_job(prompt or "", image_model, topic, prompt_model, count)
+        return redirect(url_for("create_routes.image_queued", job_id=job_id))
 
     models_and_topics = _load_models_and_topics()
     return render_template("create_image.html", **models_and_topics)
@@ -105,13 +178,20 @@ def create():
 
 @bp.route("/image_queued")
 def image_queued():
-    prompt = request.args.get("prompt", "No prompt provided.")[:_MAX_PROMPT_LENGTH]
-    model = request.args.get("model", "No model selected.")
+    job_id = request.args.get("job_id", "")
+    job = get_job(job_id) if job_id else None
+    if job is not None:
+        prompt = job["prompt"]
+        model = job["model"]
+    else:
+        prompt = request.args.get("prompt", "No prompt provided.")[:_MAX_PROMPT_LENGTH]
+        model = request.args.get("model", "No model selected.")
     if model == "Random Image Model":
         model = "Random"
     else:
         model = model.split(".")[0]
-    return render_template("image_queued.html", prompt=prompt, model=model)
+    return render_template("image_queued.html", prompt=prompt, model=model,
+                           job_id=job["id"] if job else "", count=job["count"] if job else 1)
 
 
 @bp.route("/create_image", methods=["GET"])
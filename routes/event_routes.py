@@ -0,0 +1,45 @@
+import json
+import time
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from libs.events import current_image, wait_for_change
+
+bp = Blueprint("event_routes", __name__)
+
+KEEPALIVE_INTERVAL = 25.0
+STREAM_LIFETIME = 300.0
+RETRY_MS = 5000
+MAX_POLL_TIMEOUT = 55.0
+
+
+@bp.route("/api/events", methods=["GET"])
+def image_events():
+    last_version = request.headers.get("Last-Event-ID") or request.args.get("since") or None
+
+    def stream(version):
+        # Close after a while so proxies and waitress recycle the connection;
+        # EventSource reconnects on its own with Last-Event-ID.
+        yield f"retry: {RETRY_MS}\n\n"
+        deadline = time.monotonic() + STREAM_LIFETIME
+        while time.monotonic() < deadline:
+            event = wait_for_change(version, min(KEEPALIVE_INTERVAL, max(0.0, deadline - time.monotonic())))
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            version = event["version"]
+            yield f"id: {version}\nevent: image\ndata: {json.dumps(event)}\n\n"
+
+    response = Response(stream_with_context(stream(last_version)), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@bp.route("/api/events/poll", methods=["GET"])
+def poll_image_events():
+    since = request.args.get("since") or None
+    timeout = request.args.get("timeout", MAX_POLL_TIMEOUT / 2, type=float)
+    timeout = max(0.0, min(timeout, MAX_POLL_TIMEOUT))
+    event = wait_for_change(since, timeout) if timeout else current_image()
+    if event is None or event["version"] == since:
+        return jsonify({"changed": False, "version": since})
+    return jsonify(dict(event, changed=True))
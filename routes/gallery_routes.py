@@ -1,33 +1,56 @@
-import os
 from flask import Blueprint, render_template, request, jsonify
-from libs.generic import get_favourites, save_favourites, load_config
+from libs import catalog, favourites
+from libs.create_thumbnail import get_thumbnail_settings
+from libs.generic import get_favourites, load_config
 
 bp = Blueprint("gallery_routes", __name__)
 
-_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+_DEFAULT_PAGE_SIZE = 24
+_MAX_PAGE_SIZE = 200
 
 
 @bp.route("/images", methods=["GET"])
 def gallery():
+    thumbnail_sizes, _, _ = get_thumbnail_settings()
+    return render_template("gallery.html", page_size=_DEFAULT_PAGE_SIZE, thumbnail_sizes=list(thumbnail_sizes))
+
+
+@bp.route("/api/images", methods=["GET"])
+def api_images():
     config = load_config()
-    image_folder = config["comfyui"]["output_dir"].rstrip("/")
-    favourites = get_favourites()
-    try:
-        entries = os.listdir(image_folder)
-    except FileNotFoundError:
-        entries = []
-    images = [
-        {"filename": f, "favourited": f in favourites}
-        for f in entries
-        if f.lower().endswith(_IMAGE_EXTENSIONS)
-    ]
-    images.sort(key=lambda x: os.path.getmtime(os.path.join(image_folder, x["filename"])), reverse=True)
-    return render_template("gallery.html", images=images)
+    image_folder = config["comfyui"]["output_dir"]
+    limit = request.args.get("limit", _DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, _MAX_PAGE_SIZE))
+    cursor = request.args.get("cursor") or None
+    favourites_only = request.args.get("favourites_only", "false").lower() in ("true", "1", "yes", "on")
+
+    if cursor is not None and catalog.decode_cursor(cursor) is None:
+        return jsonify({"error": "Invalid cursor"}), 400
+    if cursor is None:
+        catalog.ensure_current(image_folder)
+
+    images, next_cursor = catalog.page_images(image_folder, cursor, limit, favourites_only)
+    return jsonify({
+        "images": [
+            {
+                "filename": image["filename"],
+                "favourited": image["favourited"],
+                "width": image["width"],
+                "height": image["height"],
+            }
+            for image in images
+        ],
+        "next_cursor": next_cursor,
+    })
 
 @bp.route("/favourites", methods=["GET"])
 def get_favourites_route():
     return jsonify(get_favourites())
 
+def _valid_filename(filename) -> bool:
+    return isinstance(filename, str) and bool(filename) and not ("/" in filename or "\\" in filename or ".." in filename)
+
+
 @bp.route("/favourites/toggle", methods=["POST"])
 def toggle_favourite():
     data = request.get_json()
@@ -35,16 +58,32 @@ def toggle_favourite():
         return jsonify({"status": "error", "message": "Invalid JSON"}), 400
     
     filename = data.get("filename")
-    if not filename or "/" in filename or "\\" in filename or ".." in filename:
+    if not _valid_filename(filename):
         return jsonify({"status": "error", "message": "Invalid filename"}), 400
 
-    favourites = get_favourites()
-    is_favourited = False
-    if filename in favourites:
-        favourites.remove(filename)
-    else:
-        favourites.append(filename)
-        is_favourited = True
+    is_favourited = favourites.toggle(filename)
+    catalog.set_favourite(filename, is_favourited)
+    return jsonify({"status": "success", "favourited": is_favourited})
+
 
-    save_favourites(favourites)
-    return jsonify({"status": "success", "favourited": is_favourited})
\ No newline at end of file
+@bp.route("/favourites/toggle-batch", methods=["POST"])
+def toggle_favourites_batch():
+    data = request.get_json()
+    if data is None:
+        return jsonify({"status": "error", "message": "Invalid JSON"}), 400
+
+    filenames = data.get("filenames")
+    if not isinstance(filenames, list) or not filenames or len(filenames) > _MAX_PAGE_SIZE:
+        return jsonify({"status": "error", "message": f"Expected 1-{_MAX_PAGE_SIZE} filenames"}), 400
+    if not all(_valid_filename(f) for f in filenames):
+        return jsonify({"status": "error", "message": "Invalid filename"}), 400
+
+    favourited = data.get("favourited")
+    if favourited is None:
+        states = favourites.toggle_many(filenames)
+    elif isinstance(favourited, bool):
+        states = favourites.set_many(dict.fromkeys(filenames, favourited))
+    else:
+        return jsonify({"status": "error", "message": "favourited must be true, false or omitted"}), 400
+    catalog.set_favourites(states)
+    return jsonify({"status": "success", "favourited": states})
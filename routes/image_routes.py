@@ -1,20 +1,71 @@
-from flask import Blueprint, send_from_directory, jsonify
+from flask import Blueprint, Response, send_from_directory, jsonify, request
 import os
+import re
+from libs.catalog import get_details_many, is_image_filename
+from libs.create_thumbnail import (
+    DISPLAY_MIMETYPES, FORMAT_MIMETYPES, generate_display_rendition, get_display_settings,
+    get_thumbnail_settings, get_variant_path
+)
 from libs.generic import get_details_from_png, load_config
 
 bp = Blueprint("image_routes", __name__)
 
+_MAX_BULK_DETAILS = 200
+DEFAULT_THUMBNAIL_SIZE = 500
+
+# Archived images are named YYYYMMDD_HHMMSS_xxxxxx.png and never rewritten, so
+# they and anything derived from them can be cached for good. image.png is
+# replaced in place and must be revalidated on every use.
+_TIMESTAMPED_RE = re.compile(r"^\d{8}_\d{6}_[0-9a-f]{6}\.png$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+RENDITION_MAX_AGE = 24 * 3600
+
+
+def _is_valid_filename(filename) -> bool:
+    return (
+        isinstance(filename, str)
+        and is_image_filename(filename)
+        and not ("/" in filename or "\\" in filename or ".." in filename)
+    )
+
 
 def _get_output_dir():
     config = load_config()
     return config["comfyui"]["output_dir"].rstrip("/")
 
 
+def _apply_cache_policy(response, filename: str, max_age: int = IMMUTABLE_MAX_AGE):
+    if response.status_code not in (200, 206, 304):
+        return response
+    cache_control = response.cache_control
+    if _TIMESTAMPED_RE.match(filename):
+        cache_control.no_cache = None
+        cache_control.public = True
+        cache_control.max_age = max_age
+        cache_control.immutable = max_age == IMMUTABLE_MAX_AGE
+    else:
+        cache_control.no_cache = True
+        cache_control.max_age = 0
+        cache_control.must_revalidate = True
+    return response
+
+
 @bp.route("/images/<filename>", methods=["GET"])
 def serve_image(filename):
     if "/" in filename or "\\" in filename or ".." in filename:
         return jsonify({"error": "Invalid filename"}), 400
-    return send_from_directory(_get_output_dir(), filename)
+    return _apply_cache_policy(send_from_directory(_get_output_dir(), filename), filename)
+
+
+def _pick_tier(tiers, requested: int | None) -> int | None:
+    if not tiers:
+        return None
+    if requested is None:
+        return DEFAULT_THUMBNAIL_SIZE if DEFAULT_THUMBNAIL_SIZE in tiers else tiers[-1]
+    for tier in tiers:
+        if tier >= requested:
+            return tier
+    return tiers[-1]
 
 
 @bp.route("/images/thumbnails/<filename>", methods=["GET"])
@@ -22,7 +73,39 @@ def serve_thumbnail(filename):
     if "/" in filename or "\\" in filename or ".." in filename:
         return jsonify({"error": "Invalid filename"}), 400
     output_dir = _get_output_dir()
-    return send_from_directory(os.path.join(output_dir, "thumbnails"), filename)
+    tiers, fmt, _ = get_thumbnail_settings()
+    tier = _pick_tier(tiers, request.args.get("size", type=int))
+
+    # Only explicit Accept entries count: older browsers send image/* without decoding WebP/AVIF.
+    if tier is not None and FORMAT_MIMETYPES[fmt] in request.accept_mimetypes.values():
+        variant_path = get_variant_path(os.path.join(output_dir, filename), tier, fmt)
+        if os.path.exists(variant_path):
+            response = send_from_directory(os.path.dirname(variant_path), os.path.basename(variant_path), mimetype=FORMAT_MIMETYPES[fmt])
+            response.vary.add("Accept")
+            return _apply_cache_policy(response, filename)
+
+    response = send_from_directory(os.path.join(output_dir, "thumbnails"), filename)
+    response.vary.add("Accept")
+    return _apply_cache_policy(response, filename)
+
+
+@bp.route("/images/display/<filename>", methods=["GET"])
+def serve_display(filename):
+    if "/" in filename or "\\" in filename or ".." in filename:
+        return jsonify({"error": "Invalid filename"}), 400
+    output_dir = _get_output_dir()
+    image_path = os.path.join(output_dir, filename)
+    if not os.path.exists(image_path):
+        return jsonify({"error": "File not found"}), 404
+
+    settings = get_display_settings()
+    display_path = generate_display_rendition(image_path, settings=settings)
+    if display_path is None:
+        return _apply_cache_policy(send_from_directory(output_dir, filename), filename)
+    response = send_from_directory(os.path.dirname(display_path), os.path.basename(display_path), mimetype=DISPLAY_MIMETYPES[settings[1]])
+    # The rendition behind this URL changes if the frame size is reconfigured.
+    return _apply_cache_policy(response, filename, RENDITION_MAX_AGE)
+
 
 @bp.route("/image-details/<filename>", methods=["GET"])
 def image_details(filename):
@@ -30,7 +113,39 @@ def image_details(filename):
         return jsonify({"error": "Invalid filename"}), 400
     output_dir = _get_output_dir()
     path = os.path.join(output_dir, filename)
-    if not os.path.exists(path):
+    try:
+        st = os.stat(path)
+    except OSError:
         return jsonify({"error": "File not found"}), 404
-    details = get_details_from_png(path)
-    return jsonify({"prompt": details["p"], "model": details["m"], "date": details["d"]})
\ No newline at end of file
+
+    etag = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        details = get_details_from_png(path)
+        response = jsonify({"prompt": details["p"], "model": details["m"], "date": details["d"]})
+    response.set_etag(etag)
+    response.last_modified = st.st_mtime
+    return _apply_cache_policy(response.make_conditional(request), filename)
+
+
+@bp.route("/api/image-details", methods=["POST"])
+def bulk_image_details():
+    data = request.get_json(silent=True)
+    filenames = data.get("filenames") if isinstance(data, dict) else None
+    if not isinstance(filenames, list):
+        return jsonify({"error": "Expected a JSON body with a 'filenames' list"}), 400
+    if len(filenames) > _MAX_BULK_DETAILS:
+        return jsonify({"error": f"At most {_MAX_BULK_DETAILS} filenames per request"}), 400
+
+    valid = list(dict.fromkeys(f for f in filenames if _is_valid_filename(f)))
+    found = get_details_many(valid, _get_output_dir())
+    return jsonify({
+        "details": {
+            filename: (
+                {"prompt": details["p"], "model": details["m"], "date": details["d"]}
+                if details is not None else None
+            )
+            for filename, details in found.items()
+        }
+    })
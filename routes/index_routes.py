@@ -1,6 +1,7 @@
 import os
-from flask import Blueprint, render_template
-from libs.generic import get_details_from_png, load_config
+from flask import Blueprint, jsonify, render_template
+from libs.events import refresh_from_disk
+from libs.generic import get_build_info, load_config
 
 bp = Blueprint("index_routes", __name__)
 
@@ -10,13 +11,17 @@ def index():
     config = load_config()
     output_folder = config["comfyui"]["output_dir"]
     image_filename = "image.png"
-    image_path = os.path.join(output_folder, image_filename)
-    details = get_details_from_png(image_path)
-    prompt = details.get("p", "") if details else ""
+    event = refresh_from_disk() if os.path.exists(os.path.join(output_folder, image_filename)) else None
+    prompt = event["prompt"] if event else ""
 
     return render_template(
         "index.html",
         image=image_filename,
+        image_version=event["version"] if event else "",
         prompt=prompt if prompt else "No prompt available",
         reload_interval=config["frame"]["reload_interval"],
-    )
\ No newline at end of file
+    )
+
+@bp.route("/api/build-info", methods=["GET"])
+def api_build_info():
+    return jsonify(get_build_info())
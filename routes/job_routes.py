@@ -1,5 +1,8 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from libs.comfyui import cancel_current_job, get_queue_details
+from libs.comfy_pool import status as backend_status
+from libs.jobs import get_job, list_jobs
+from libs import llm_clients, model_catalog, prompt_buffer, prompt_router, ready_pool
 
 bp = Blueprint("job_routes", __name__)
 
@@ -9,4 +12,49 @@ def cancel_job():
 
 @bp.route("/api/queue", methods=["GET"])
 def api_queue():
-    return jsonify(get_queue_details())
\ No newline at end of file
+    return jsonify(get_queue_details())
+
+@bp.route("/api/backends", methods=["GET"])
+def api_backends():
+    return jsonify(backend_status())
+
+@bp.route("/api/model-catalog", methods=["GET"])
+def api_model_catalog():
+    return jsonify(model_catalog.status())
+
+@bp.route("/api/llm-clients", methods=["GET"])
+def api_llm_clients():
+    return jsonify(llm_clients.status())
+
+@bp.route("/api/prompt-router", methods=["GET"])
+def api_prompt_router():
+    return jsonify(prompt_router.status())
+
+@bp.route("/api/prompt-buffer", methods=["GET"])
+def api_prompt_buffer():
+    return jsonify(prompt_buffer.status())
+
+@bp.route("/api/ready-pool", methods=["GET"])
+def api_ready_pool():
+    return jsonify(ready_pool.status())
+
+@bp.route("/api/ready-pool/next", methods=["POST"])
+def api_ready_pool_next():
+    shown = ready_pool.advance()
+    if shown is None:
+        return jsonify({"error": "No pre-rendered image is ready"}), 409
+    return jsonify(dict(ready_pool.status(), shown=shown))
+
+@bp.route("/api/jobs", methods=["GET"])
+def api_jobs():
+    limit = max(1, min(request.args.get("limit", 50, type=int), 200))
+    active_only = request.args.get("active", "false").lower() in ("true", "1", "yes", "on")
+    return jsonify(list_jobs(limit, active_only))
+
+
+@bp.route("/api/jobs/<job_id>", methods=["GET"])
+def api_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
@@ -0,0 +1,32 @@
+from flask import Blueprint, jsonify, request
+from libs import prompt_history
+
+bp = Blueprint("prompt_routes", __name__)
+
+_DEFAULT_LIMIT = 100
+
+
+@bp.route("/api/prompts", methods=["GET"])
+def api_prompts():
+    prompts = prompt_history.query(
+        since=request.args.get("since") or None,
+        until=request.args.get("until") or None,
+        topic=request.args.get("topic"),
+        model=request.args.get("model"),
+        text=request.args.get("q") or None,
+        limit=request.args.get("limit", _DEFAULT_LIMIT, type=int),
+        offset=request.args.get("offset", 0, type=int),
+    )
+    return jsonify({"prompts": prompts})
+
+
+@bp.route("/api/prompts/stats", methods=["GET"])
+def api_prompt_stats():
+    by = request.args.get("by", "topic")
+    if by not in prompt_history.GROUPINGS:
+        return jsonify({"error": f"by must be one of {', '.join(prompt_history.GROUPINGS)}"}), 400
+    return jsonify({"by": by, "counts": prompt_history.counts(
+        by,
+        since=request.args.get("since") or None,
+        until=request.args.get("until") or None,
+    )})
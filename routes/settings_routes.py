@@ -73,7 +73,7 @@ def config_editor():
             config.write(configfile)
 
         from libs.generic import ConfigSingleton
-        ConfigSingleton.reset()
+        ConfigSingleton.reload()
 
         return redirect(url_for('settings_route.config_editor'))
 
@@ -0,0 +1,122 @@
+"""Failover of a render whose ComfyUI backend dies mid-render.
+
+Runs two fake_comfyui.py servers, starts a render on the first and kills
+it while the prompt is executing. The render must finish on the second
+backend and the dead one must be put into backoff.
+
+    python -m unittest discover -s tests
+"""
+import configparser
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL = "a.safetensors"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_fake(port: int, step_delay: float) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, "fake_comfyui.py"), "--port", str(port),
+         "--models", MODEL, "--steps", "20", "--step-delay", str(step_delay)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/queue", timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"fake ComfyUI on port {port} did not start")
+
+
+class ComfyFailoverTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cwd = os.getcwd()
+        cls.workdir = tempfile.mkdtemp()
+        cls.slow_url = f"http://127.0.0.1:{_free_port()}"
+        cls.fast_url = f"http://127.0.0.1:{_free_port()}"
+        cls.slow = _start_fake(int(cls.slow_url.rsplit(":", 1)[1]), step_delay=0.5)
+        cls.fast = _start_fake(int(cls.fast_url.rsplit(":", 1)[1]), step_delay=0.01)
+
+        config = configparser.ConfigParser()
+        config.read(os.path.join(REPO_DIR, "user_config.cfg.sample"))
+        config["comfyui"]["comfyui_url"] = f"{cls.slow_url},{cls.fast_url}"
+        config["comfyui"]["models"] = MODEL
+        with open(os.path.join(cls.workdir, "user_config.cfg"), "w") as f:
+            config.write(f)
+        shutil.copy(os.path.join(REPO_DIR, "workflow_sdxl.json"), cls.workdir)
+        os.makedirs(os.path.join(cls.workdir, "output"))
+        os.chdir(cls.workdir)
+        sys.path.insert(0, REPO_DIR)
+
+        # comfy_api_simplified needs an event loop at import, so import on the main thread.
+        from libs import comfyui, comfy_pool
+        cls.comfyui, cls.comfy_pool = comfyui, comfy_pool
+
+    @classmethod
+    def tearDownClass(cls):
+        for process in (cls.slow, cls.fast):
+            process.kill()
+            process.wait()
+        os.chdir(cls.cwd)
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+
+    def test_render_fails_over_when_backend_dies(self):
+        from libs import comfy_progress
+
+        comfyui, comfy_pool = self.comfyui, self.comfy_pool
+        snapshot = comfyui.get_config_snapshot()
+        workflow, output_node = comfyui._build_workflow(snapshot, "SDXL", "a lighthouse at dusk", "test", MODEL)
+        tried: list[str] = []
+        result: dict = {}
+
+        def render():
+            try:
+                result["downloads"] = comfyui._render(
+                    workflow, output_node, MODEL, snapshot.output_dir, tried=tried, prefer=self.slow_url)
+            except Exception as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=render, daemon=True)
+        thread.start()
+
+        deadline = time.monotonic() + 15
+        while not comfy_progress.running_progress() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self.assertTrue(comfy_progress.running_progress(), "render never started on the first backend")
+        self.slow.kill()
+        self.slow.wait()
+
+        thread.join(timeout=30)
+        self.assertFalse(thread.is_alive(), "render still blocked after its backend died")
+        self.assertNotIn("error", result)
+        self.assertEqual(tried, [self.slow_url, self.fast_url])
+        self.assertTrue(result["downloads"])
+        for path in result["downloads"]:
+            self.assertTrue(os.path.exists(path))
+
+        health = {backend["url"]: backend["healthy"] for backend in comfy_pool.status()}
+        self.assertFalse(health[self.slow_url])
+        self.assertTrue(health[self.fast_url])
+
+
+if __name__ == "__main__":
+    unittest.main()